@@ -3,35 +3,89 @@
 
 import rospy
 import os
+import json
+import sqlite3
+import time
 from std_msgs.msg import String
 
+
+def read_action_group(path):
+    """Reads frame count and total duration (seconds) of a .d6a file.
+
+    .d6a files are SQLite databases with one row per frame in the
+    ActionGroup table; the second column is the frame time in ms.
+    """
+    connection = sqlite3.connect("file:%s?mode=ro" % path, uri=True)
+    try:
+        frames, total_ms = connection.execute("select count(*), sum([Time]) from ActionGroup").fetchone()
+    finally:
+        connection.close()
+    return frames, (total_ms or 0) / 1000.0
+
+
 class ActionGroupsPublisher:
     def __init__(self):
         # Initialization of the node
         rospy.init_node('action_groups_publisher')
-        
+
         # Path to the data folder
         self.folder_path = "/home/ubuntu/software/ainex_controller/ActionGroups"
-        
-        # Create a publisher for the /action_groups_data topic
-        self.pub = rospy.Publisher('/action_groups_data', String, queue_size=10)
-        
-        # Timer for periodic publishing (once per second)
-        rospy.Timer(rospy.Duration(1), self.publish_data)
-        
+
+        # Latched: late subscribers get the current catalog, so it is only
+        # published when the folder changes
+        self.pub = rospy.Publisher('/action_groups_data', String, queue_size=1, latch=True)
+
+        self.version = 0
+        # file name -> ((mtime, size), entry), so unchanged files are not reopened
+        self.entries = {}
+        self.signature = None
+
+        # Timer for checking the folder (once per second); only stats files
+        rospy.Timer(rospy.Duration(1), self.check_folder)
+        self.check_folder(None)
+
         rospy.loginfo("ActionGroups Publisher запущен и публикует данные в /action_groups_data")
 
-    def publish_data(self, event):
+    def scan(self):
+        """Returns {file name: (mtime, size)} of the .d6a files in the folder."""
+        stats = {}
+        for name in os.listdir(self.folder_path):
+            if not name.endswith(".d6a"):
+                continue
+            stat = os.stat(os.path.join(self.folder_path, name))
+            stats[name] = (stat.st_mtime, stat.st_size)
+        return stats
+
+    def entry(self, name, stat):
+        cached = self.entries.get(name)
+        if cached is not None and cached[0] == stat:
+            return cached[1]
+        entry = {"name": name[:-len(".d6a")], "file": name, "frames": None, "duration": None}
+        try:
+            entry["frames"], entry["duration"] = read_action_group(os.path.join(self.folder_path, name))
+        except sqlite3.Error as e:
+            rospy.logwarn("Не удалось прочитать %s: %s", name, str(e))
+        self.entries[name] = (stat, entry)
+        return entry
+
+    def check_folder(self, event):
         try:
-            # Get the list of files in the folder
-            files = os.listdir(self.folder_path)
-            
-            # Form a data string
-            data = "ActionGroups: " + ", ".join(files)
-            
-            # Publish the data
+            stats = self.scan()
+            signature = sorted(stats.items())
+            if signature == self.signature:
+                return
+
+            actions = [self.entry(name, stat) for name, stat in signature]
+            for name in list(self.entries):
+                if name not in stats:
+                    del self.entries[name]
+            self.signature = signature
+            self.version += 1
+
+            data = json.dumps({"version": self.version, "stamp": time.time(), "actions": actions})
             self.pub.publish(data)
-            
+            rospy.loginfo("ActionGroups catalog v%d: %d actions", self.version, len(actions))
+
         except Exception as e:
             rospy.logerr("Ошибка при чтении папки: %s", str(e))
 
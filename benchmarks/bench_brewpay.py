@@ -0,0 +1,200 @@
+"""End-to-end BrewPay latency against local stand-ins.
+
+Runs the real ``server.BrewPay`` code path against a fake rosbridge (which
+plays the robot: tilting the head hides the QR code for ``--settle``
+seconds and the camera streams at ``--fps``) and a fake Solana JSON-RPC
+server, with optional injected latencies. Reports p50/p95/p99 per stage
+from the server's own metrics:
+
+    tilt settle, capture, QR decode, validation, key load,
+    blockhash, sign, send, confirm
+
+    python benchmarks/bench_brewpay.py --runs 30
+    python benchmarks/bench_brewpay.py --runs 30 --rpc-latency 0.08 --miss 0.3
+    python benchmarks/bench_brewpay.py --frames qr_0.png qr_1.png   # recorded QR frames
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import base58
+import cv2
+import numpy as np
+import qrcode
+from solders.keypair import Keypair
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from brewie.metrics import percentile  # noqa: E402
+from fake_rosbridge import FakeRosbridge  # noqa: E402
+from fake_solana_rpc import FakeSolanaRPC  # noqa: E402
+
+STAGES = [
+    ("tilt settle", "head.settle"),
+    ("capture", "image.capture"),
+    ("QR decode", "brewpay.qr_scan"),
+    ("validation", "brewpay.validate"),
+    ("key load", "brewpay.key_load"),
+    ("blockhash", "payment.blockhash"),
+    ("sign", "solana.sign"),
+    ("send", "solana.send"),
+    ("confirm", "solana.confirm"),
+]
+IMAGE_TOPIC = "/camera/image_raw/compressed"
+TILT_TOPIC = "/head_tilt_controller/command"
+
+
+def wallet_address() -> str:
+    """A random 44-character address; the server rejects the shorter ones."""
+    while True:
+        address = str(Keypair().pubkey())
+        if len(address) == 44:
+            return address
+
+
+def qr_scene(data: str, width: int, height: int) -> np.ndarray:
+    """A grey scene with a QR code of ``data`` in the middle."""
+    code = qrcode.QRCode(border=4)
+    code.add_data(data)
+    code.make()
+    matrix = (~np.array(code.get_matrix(), dtype=bool)).astype(np.uint8) * 255
+    side = height // 3
+    scene = np.full((height, width, 3), 110, dtype=np.uint8)
+    top, left = (height - side) // 2, (width - side) // 2
+    scene[top : top + side, left : left + side] = cv2.resize(matrix, (side, side), interpolation=cv2.INTER_NEAREST)[..., None]
+    return scene
+
+
+class Robot:
+    """Streams camera frames; the QR code is visible once the head settled."""
+
+    def __init__(self, fake: FakeRosbridge, qr_frames: list[bytes], blank: bytes, fps: float, settle: float, miss: float, blurred: list[bytes]):
+        self.fake = fake
+        self.qr_frames = qr_frames
+        self.blurred = blurred
+        self.blank = blank
+        self.fps = fps
+        self.settle = settle
+        self.miss = miss
+        self.tilt = 0.0
+        self.moved = time.time()
+        self.seq = 0
+        fake.on_publish(TILT_TOPIC, self.on_tilt)
+
+    def on_tilt(self, msg: dict):
+        self.tilt = msg.get("position", 0.0)
+        self.moved = time.time()
+
+    def frame(self) -> bytes:
+        if self.tilt > -0.2 or time.time() - self.moved < self.settle:
+            return self.blank
+        index = self.seq % len(self.qr_frames)
+        return self.blurred[index] if random.random() < self.miss else self.qr_frames[index]
+
+    def run(self):
+        period = 1.0 / self.fps
+        while True:
+            now = time.time()
+            data = base64.b64encode(self.frame()).decode("ascii")
+            header = {"seq": self.seq, "stamp": {"secs": int(now), "nsecs": int((now % 1) * 1e9)}, "frame_id": "camera"}
+            self.fake.publish(IMAGE_TOPIC, {"header": header, "format": "jpeg", "data": data})
+            self.seq += 1
+            time.sleep(max(0.0, period - (time.time() - now)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", nargs="*", help="recorded frames showing the QR code")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--amount", type=float, default=0.0001)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=15)
+    parser.add_argument("--settle", type=float, default=0.5, help="seconds the head needs before the QR code is in view")
+    parser.add_argument("--miss", type=float, default=0.0, help="fraction of QR frames replaced by blurred, unreadable ones")
+    parser.add_argument("--ros-latency", type=float, default=0.0, help="seconds added to every rosbridge message")
+    parser.add_argument("--rpc-latency", type=float, default=0.03, help="seconds added to every Solana RPC call")
+    parser.add_argument("--send-latency", type=float, default=None, help="override for sendTransaction")
+    parser.add_argument("--confirm-after", type=float, default=0.4, help="seconds until a sent transaction is confirmed")
+    parser.add_argument("--no-wait", action="store_true", help="return after sending (payment jobs) instead of confirming")
+    args = parser.parse_args()
+
+    if args.frames:
+        scenes = [cv2.imread(path) for path in args.frames]
+    else:
+        scenes = [qr_scene(wallet_address(), args.width, args.height)]
+    qr_frames = [cv2.imencode(".jpg", scene)[1].tobytes() for scene in scenes]
+    blurred = [cv2.imencode(".jpg", cv2.GaussianBlur(scene, (41, 41), 0))[1].tobytes() for scene in scenes]
+    height, width = scenes[0].shape[:2]
+    blank = cv2.imencode(".jpg", np.full((height, width, 3), 110, dtype=np.uint8))[1].tobytes()
+
+    latency = args.rpc_latency
+    if args.send_latency is not None:
+        latency = {method: args.rpc_latency for method in ("getHealth", "getLatestBlockhash", "getBlockHeight", "getSignatureStatuses")}
+        latency["sendTransaction"] = args.send_latency
+    rpc = FakeSolanaRPC(latency=latency, confirm_after=args.confirm_after).start()
+    rosbridge = FakeRosbridge(latency=args.ros_latency).start()
+    robot = Robot(rosbridge, qr_frames, blank, args.fps, args.settle, args.miss, blurred)
+    threading.Thread(target=robot.run, daemon=True).start()
+
+    os.environ.update(
+        BREWIE_ROS_HOST="127.0.0.1",
+        BREWIE_ROS_PORT=str(rosbridge.port),
+        BREWIE_SOLANA_RPC=rpc.url,
+    )
+    os.environ.setdefault("TOGETHER_API_KEY", "unused")
+    # The server keeps photos and the key relative to its working directory
+    workdir = tempfile.mkdtemp(prefix="bench_brewpay_")
+    os.chdir(workdir)
+    os.makedirs("master_sh")
+    with open("master_sh/sol_private_key", "w") as f:
+        f.write(base58.b58encode(bytes(Keypair())).decode())
+
+    import logging
+
+    logging.disable(logging.INFO)
+    import server
+
+    robot = server.fleet.start()
+    with robot.camera.active():
+        robot.camera.wait_for_frame(timeout=5)
+
+    print(f"{args.runs} runs, {width}x{height} @ {args.fps:g} fps, settle {args.settle}s, miss {args.miss:.0%}, "
+          f"rpc latency {args.rpc_latency * 1000:.0f} ms, ros latency {args.ros_latency * 1000:.0f} ms")
+    server.metrics.reset()
+    totals, failures = [], []
+    for run in range(args.runs):
+        start = time.perf_counter()
+        # One lamport more each run, identical transfers would be re-signed
+        result = asyncio.run(server.BrewPay(args.amount + run * 1e-9, wait=not args.no_wait))
+        totals.append(time.perf_counter() - start)
+        if not result.startswith("Submitted" if args.no_wait else "Success"):
+            failures.append(result)
+
+    timings = server.metrics.snapshot()["timings"]
+    print(f"{'stage':<12} {'n':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, name in STAGES:
+        timing = timings.get(name)
+        if timing is None:
+            print(f"{label:<12} {0:>4} {'-':>9} {'-':>9} {'-':>9}")
+            continue
+        print(f"{label:<12} {timing['count']:>4} {timing['p50_ms']:>9.1f} {timing['p95_ms']:>9.1f} {timing['p99_ms']:>9.1f}")
+    totals = sorted(1000 * total for total in totals)
+    print(f"{'total':<12} {len(totals):>4} {percentile(totals, 0.50):>9.1f} {percentile(totals, 0.95):>9.1f} {percentile(totals, 0.99):>9.1f}")
+    if failures:
+        print(f"{len(failures)} failed runs, e.g. {failures[0]}")
+
+    robot.ros.terminate()
+
+
+if __name__ == "__main__":
+    main()
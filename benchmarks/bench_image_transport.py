@@ -0,0 +1,214 @@
+"""Compares JSON and binary (CBOR) rosbridge transports for camera frames.
+
+A fake rosbridge runs in a child process and streams the same JPEG frame as
+fast as the client reads it, encoded the way rosbridge would for the
+requested ``compression``. The client side runs the same code the server
+uses (``brewie.rosbridge`` + ``brewie.camera.Frame``) and reports frames/sec,
+client CPU per frame and bytes on the wire.
+
+    python benchmarks/bench_image_transport.py --frames 500 --width 1280 --height 720
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import struct
+import sys
+import time
+
+import cv2
+import numpy as np
+import websocket
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from brewie.camera import Frame  # noqa: E402
+from brewie.rosbridge import decode_binary_message  # noqa: E402
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+TOPIC = "/camera/image_raw/compressed"
+MESSAGE_TYPE = "sensor_msgs/CompressedImage"
+
+
+def cbor_dumps(value) -> bytes:
+    def head(major, length):
+        if length < 24:
+            return bytes([major << 5 | length])
+        for info, fmt in ((24, ">B"), (25, ">H"), (26, ">I"), (27, ">Q")):
+            if length < 1 << (8 * struct.calcsize(fmt)):
+                return bytes([major << 5 | info]) + struct.pack(fmt, length)
+        raise ValueError("length too large")
+
+    if isinstance(value, bool):
+        return b"\xf5" if value else b"\xf4"
+    if isinstance(value, int):
+        return head(0, value) if value >= 0 else head(1, -1 - value)
+    if isinstance(value, float):
+        return b"\xfb" + struct.pack(">d", value)
+    if isinstance(value, (bytes, bytearray)):
+        return head(2, len(value)) + bytes(value)
+    if isinstance(value, str):
+        encoded = value.encode("utf-8")
+        return head(3, len(encoded)) + encoded
+    if isinstance(value, list):
+        return head(4, len(value)) + b"".join(cbor_dumps(v) for v in value)
+    if isinstance(value, dict):
+        return head(5, len(value)) + b"".join(cbor_dumps(k) + cbor_dumps(v) for k, v in value.items())
+    raise TypeError(type(value))
+
+
+def make_payload(compression: str, jpeg: bytes, seq: int) -> tuple[int, bytes]:
+    secs, nsecs = int(time.time()), seq % 1_000_000_000
+    header = {"seq": seq, "stamp": {"secs": secs, "nsecs": nsecs}, "frame_id": "camera"}
+    if compression == "cbor-raw":
+        frame_id = b"camera"
+        raw = (
+            struct.pack("<IIII", seq, secs, nsecs, len(frame_id))
+            + frame_id
+            + struct.pack("<I", 4)
+            + b"jpeg"
+            + struct.pack("<I", len(jpeg))
+            + jpeg
+        )
+        envelope = {"op": "publish", "topic": TOPIC, "msg": {"secs": secs, "nsecs": nsecs, "bytes": raw}}
+        return 0x2, cbor_dumps(envelope)
+    msg = {"header": header, "format": "jpeg", "data": jpeg}
+    if compression == "cbor":
+        return 0x2, cbor_dumps({"op": "publish", "topic": TOPIC, "msg": msg})
+    msg["data"] = base64.b64encode(jpeg).decode("ascii")
+    return 0x1, json.dumps({"op": "publish", "topic": TOPIC, "msg": msg}).encode("utf-8")
+
+
+def ws_frame(opcode: int, payload: bytes) -> bytes:
+    length = len(payload)
+    if length < 126:
+        head = struct.pack(">BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        head = struct.pack(">BBH", 0x80 | opcode, 126, length)
+    else:
+        head = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+    return head + payload
+
+
+def recv_exact(conn: socket.socket, n: int) -> bytes:
+    data = b""
+    while len(data) < n:
+        chunk = conn.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("client closed")
+        data += chunk
+    return data
+
+
+def read_client_frame(conn: socket.socket) -> bytes:
+    b0, b1 = recv_exact(conn, 2)
+    length = b1 & 0x7F
+    if length == 126:
+        (length,) = struct.unpack(">H", recv_exact(conn, 2))
+    elif length == 127:
+        (length,) = struct.unpack(">Q", recv_exact(conn, 8))
+    mask = recv_exact(conn, 4) if b1 & 0x80 else b"\0\0\0\0"
+    data = recv_exact(conn, length)
+    return bytes(c ^ mask[i % 4] for i, c in enumerate(data))
+
+
+def fake_rosbridge(port_queue, jpeg: bytes, frames: int):
+    server = socket.socket()
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    port_queue.put(server.getsockname()[1])
+    while True:
+        conn, _ = server.accept()
+        request = b""
+        while b"\r\n\r\n" not in request:
+            request += conn.recv(4096)
+        key = next(
+            line.split(b":", 1)[1].strip()
+            for line in request.split(b"\r\n")
+            if line.lower().startswith(b"sec-websocket-key")
+        )
+        accept = base64.b64encode(hashlib.sha1(key + WS_GUID.encode()).digest())
+        conn.sendall(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+            b"Connection: Upgrade\r\nSec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+        subscribe = json.loads(read_client_frame(conn))
+        compression = subscribe.get("compression", "none")
+        for seq in range(frames):
+            opcode, payload = make_payload(compression, jpeg, seq)
+            conn.sendall(ws_frame(opcode, payload))
+        conn.sendall(ws_frame(0x8, b""))
+        conn.close()
+
+
+def run_client(port: int, compression: str, frames: int, decode: bool) -> dict:
+    # roslibpy (autobahn) validates UTF-8 natively; do not bill the JSON path
+    # for websocket-client's pure-Python validator
+    ws = websocket.create_connection(f"ws://127.0.0.1:{port}", skip_utf8_validation=True)
+    op = {"op": "subscribe", "topic": TOPIC, "type": MESSAGE_TYPE}
+    if compression != "json":
+        op["compression"] = compression
+    ws.send(json.dumps(op))
+
+    received = wire_bytes = 0
+    wall, cpu = time.perf_counter(), time.process_time()
+    while received < frames:
+        opcode, payload = ws.recv_data()
+        if opcode == websocket.ABNF.OPCODE_CLOSE:
+            break
+        wire_bytes += len(payload)
+        if compression == "json":
+            msg = json.loads(payload)["msg"]
+        else:
+            msg = decode_binary_message(payload, compression, MESSAGE_TYPE)
+        frame = Frame(received, msg)
+        assert len(frame.data) > 0
+        if decode:
+            frame.decode()
+        received += 1
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    ws.close()
+    return {
+        "transport": compression,
+        "frames": received,
+        "fps": received / wall,
+        "cpu_ms_per_frame": 1000 * cpu / received,
+        "kb_per_frame": wire_bytes / received / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--decode", action="store_true", help="also run cv2.imdecode on every frame")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    image = cv2.GaussianBlur(rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8), (9, 9), 0)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, args.quality])
+    jpeg = encoded.tobytes()
+
+    print(f"{args.width}x{args.height} JPEG q{args.quality}: {len(jpeg) / 1024:.1f} KiB, {args.frames} frames")
+    print(f"{'transport':<10} {'fps':>9} {'cpu ms/frame':>13} {'KiB/frame':>10}")
+    for transport in ("json", "cbor", "cbor-raw"):
+        port_queue = multiprocessing.Queue()
+        server = multiprocessing.Process(target=fake_rosbridge, args=(port_queue, jpeg, args.frames), daemon=True)
+        server.start()
+        result = run_client(port_queue.get(timeout=5), transport, args.frames, args.decode)
+        server.terminate()
+        print(
+            f"{result['transport']:<10} {result['fps']:>9.1f} "
+            f"{result['cpu_ms_per_frame']:>13.3f} {result['kb_per_frame']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
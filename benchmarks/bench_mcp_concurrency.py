@@ -0,0 +1,199 @@
+"""Latency of mixed MCP tool calls from several clients at once.
+
+Starts the real server (``server.py``) against a fake rosbridge that streams
+camera frames, then lets ``--clients`` MCP sessions call a weighted mix of
+tools for ``--seconds``. Motions (defend, make_step, run_action) share the
+robot, while cheap calls (get_image, get_metrics) should return in
+milliseconds even while a defend is running. run_action plays in its
+default sync mode, action_status waits on the latest action and
+get_available_actions long-polls for a newer catalog, so tools that wait
+show up here if they hold the event loop. Reports p50/p95/p99 and max per
+tool.
+
+    python benchmarks/bench_mcp_concurrency.py --clients 4 --seconds 20
+    python benchmarks/bench_mcp_concurrency.py --mix defend:1,get_image:4,get_metrics:4
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from brewie.metrics import percentile  # noqa: E402
+from fake_rosbridge import FakeRosbridge  # noqa: E402
+
+IMAGE_TOPIC = "/camera/image_raw/compressed"
+CATALOG_TOPIC = "/action_groups_data"
+ACTION_SECONDS = 1.0
+CALLS = {
+    "defend": {"rotate": 0.6, "UPDOWN": 0.1},
+    "make_step": {"x": 0.0, "z": 1.0},
+    "run_action": {"action_name": "wave"},
+    # job_id is filled in with the latest run_action job
+    "action_status": {"wait": 1.0},
+    # The catalog stays at version 1, so this waits for the whole timeout
+    "get_available_actions": {"newer_than": 1, "timeout": 1.0},
+    "get_image": {"max_side": 320},
+    "get_metrics": {},
+}
+
+
+def stream_camera(fake: FakeRosbridge, width: int, height: int, fps: float):
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(8):
+        noise = rng.integers(40, 200, (height // 8, width // 8, 3), dtype=np.uint8)
+        scene = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+        frames.append(cv2.imencode(".jpg", scene)[1].tobytes())
+    frames = [base64.b64encode(frame).decode("ascii") for frame in frames]
+    seq = 0
+    while True:
+        now = time.time()
+        header = {"seq": seq, "stamp": {"secs": int(now), "nsecs": int((now % 1) * 1e9)}, "frame_id": "camera"}
+        fake.publish(IMAGE_TOPIC, {"header": header, "format": "jpeg", "data": frames[seq % len(frames)]})
+        seq += 1
+        time.sleep(max(0.0, 1.0 / fps - (time.time() - now)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def parse_mix(text: str) -> list[tuple[str, int]]:
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition(":")
+        if name not in CALLS:
+            raise SystemExit(f"Unknown tool {name}, choose from {', '.join(CALLS)}")
+        mix.append((name, int(weight or 1)))
+    return mix
+
+
+async def client(url: str, mix, deadline: float, seed: int, results: dict, errors: list, actions: list):
+    rng = random.Random(seed)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            while time.monotonic() < deadline:
+                name = rng.choices(names, weights)[0]
+                arguments = dict(CALLS[name])
+                if name == "run_action":
+                    # Action job ids count up from 1 in submission order
+                    actions.append(len(actions) + 1)
+                elif name == "action_status":
+                    arguments["job_id"] = actions[-1] if actions else 0
+                start = time.perf_counter()
+                result = await session.call_tool(name, arguments)
+                results.setdefault(name, []).append(1000 * (time.perf_counter() - start))
+                if result.isError:
+                    errors.append(f"{name}: {result.content[0].text if result.content else ''}")
+
+
+async def run_clients(url: str, mix, clients: int, seconds: float):
+    results: dict[str, list[float]] = {}
+    errors: list[str] = []
+    actions: list[int] = []
+    deadline = time.monotonic() + seconds
+    await asyncio.gather(*(client(url, mix, deadline, seed, results, errors, actions) for seed in range(clients)))
+    return results, errors
+
+
+async def wait_ready(url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with streamablehttp_client(url) as (read, write, _):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--mix", default="defend:1,make_step:2,run_action:1,action_status:1,get_available_actions:1,get_image:4,get_metrics:4",
+                        help="tool:weight list, from " + ", ".join(CALLS))
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=15)
+    parser.add_argument("--ros-latency", type=float, default=0.0, help="seconds added to every rosbridge message")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    rosbridge = FakeRosbridge(latency=args.ros_latency).start()
+    threading.Thread(target=stream_camera, args=(rosbridge, args.width, args.height, args.fps), daemon=True).start()
+    catalog = {"version": 1, "stamp": time.time(), "actions": [{"name": "wave", "file": "wave.d6a", "frames": 10, "duration": ACTION_SECONDS}]}
+    rosbridge.publish(CATALOG_TOPIC, {"data": json.dumps(catalog)}, latch=True)
+
+    port = free_port()
+    env = dict(
+        os.environ,
+        BREWIE_ROS_HOST="127.0.0.1",
+        BREWIE_ROS_PORT=str(rosbridge.port),
+        BREWIE_MCP_PORT=str(port),
+    )
+    env.setdefault("TOGETHER_API_KEY", "unused")
+    # The server keeps photos relative to its working directory
+    workdir = tempfile.mkdtemp(prefix="bench_mcp_")
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, "server.py")],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/mcp"
+    try:
+        asyncio.run(wait_ready(url, timeout=30))
+        print(f"{args.clients} clients for {args.seconds:g}s, mix {args.mix}")
+        start = time.perf_counter()
+        results, errors = asyncio.run(run_clients(url, mix, args.clients, args.seconds))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        rosbridge.stop()
+
+    print(f"{'tool':<22} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, _ in mix:
+        values = sorted(results.get(name, []))
+        if not values:
+            print(f"{name:<22} {0:>5} {'-':>9} {'-':>9} {'-':>9} {'-':>9}")
+            continue
+        print(f"{name:<22} {len(values):>5} {percentile(values, 0.50):>9.1f} {percentile(values, 0.95):>9.1f} "
+              f"{percentile(values, 0.99):>9.1f} {values[-1]:>9.1f}")
+    total = sum(len(values) for values in results.values())
+    print(f"{total} calls in {elapsed:.1f}s ({total / elapsed:.1f}/s)")
+    if errors:
+        print(f"{len(errors)} failed calls, e.g. {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Compares the local color prefilter with the VLM for sniper target selection.
+
+Each sweep is a group of frames (recorded captures or synthetic scenes with
+one colored ball). The prefilter path is timed on every sweep and scored
+against the expected photo; with --vlm the same sweeps are also sent to the
+Together model the server uses (needs TOGETHER_API_KEY), otherwise only the
+local part of the VLM path (resize + encode) is timed.
+
+    python benchmarks/bench_target_prefilter.py --sweeps 50
+    python benchmarks/bench_target_prefilter.py --target "purple ball" --expected 2 \\
+        photos/environment/image_0.png photos/environment/image_1.png photos/environment/image_2.png
+    python benchmarks/bench_target_prefilter.py --sweeps 5 --vlm
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from brewie.colorfilter import ColorPrefilter  # noqa: E402
+from brewie.imaging import VisionPreprocessor  # noqa: E402
+
+MODEL = "Qwen/Qwen2.5-VL-72B-Instruct"
+DISTRACTORS = [(40, 160, 40), (200, 120, 30), (30, 200, 230)]
+
+
+def synthetic_sweep(rng, count: int, width: int, height: int, color) -> tuple[list[np.ndarray], int]:
+    """``count`` textured frames with distractor blobs and the target in one."""
+    target = int(rng.integers(0, count))
+    frames = []
+    for index in range(count):
+        noise = rng.integers(40, 200, (height // 8, width // 8, 3), dtype=np.uint8)
+        frame = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+        for bgr in DISTRACTORS:
+            center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+            cv2.circle(frame, center, int(rng.integers(height // 20, height // 8)), bgr, -1)
+        if index == target:
+            center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+            cv2.circle(frame, center, int(rng.integers(height // 16, height // 8)), color, -1)
+        frames.append(frame)
+    return frames, target
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def vlm_select(client, preprocessor: VisionPreprocessor, target: str, frames: list[np.ndarray]):
+    content = [{"type": "text", "text": preprocessor.prompt(target, len(frames))}]
+    for url in preprocessor.data_urls(frames):
+        content.append({"type": "image_url", "image_url": {"url": url}})
+    response = client.chat.completions.create(model=MODEL, messages=[{"role": "user", "content": content}])
+    answer = response.choices[0].message.content.strip()
+    return int(answer) if answer.isdigit() else None
+
+
+def report(name: str, seconds: list[float], decided: int, correct: int, total: int):
+    ms = [1000 * s for s in seconds]
+    print(
+        f"{name:<22} {statistics.median(ms):>9.2f} {percentile(ms, 0.95):>9.2f} "
+        f"{decided:>4}/{total:<4} {correct:>4}/{total:<4}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="recorded frames of one sweep, in sweep order")
+    parser.add_argument("--target", default="purple ball")
+    parser.add_argument("--expected", type=int, help="index of the photo showing the target in the recorded sweep")
+    parser.add_argument("--sweeps", type=int, default=50, help="synthetic sweeps if no images are given")
+    parser.add_argument("--positions", type=int, default=3)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--vlm", action="store_true", help="also call the Together VLM")
+    args = parser.parse_args()
+
+    if args.images:
+        sweeps = [([cv2.imread(path) for path in args.images], args.expected)]
+    else:
+        rng = np.random.default_rng(0)
+        sweeps = [synthetic_sweep(rng, args.positions, args.width, args.height, (200, 40, 160)) for _ in range(args.sweeps)]
+
+    prefilter = ColorPrefilter(threshold=args.threshold)
+    preprocessor = VisionPreprocessor()
+    client = None
+    if args.vlm:
+        from together import Together
+
+        client = Together()
+
+    print(f"{len(sweeps)} sweeps of {len(sweeps[0][0])} frames, target {args.target!r}")
+    print(f"{'path':<22} {'p50 ms':>9} {'p95 ms':>9} {'decided':>9} {'correct':>9}")
+
+    times, decided, correct = [], 0, 0
+    for frames, expected in sweeps:
+        start = time.perf_counter()
+        index, _ = prefilter.select(args.target, frames)
+        times.append(time.perf_counter() - start)
+        decided += index is not None
+        correct += index is not None and index == expected
+    report("color prefilter", times, decided, correct, len(sweeps))
+
+    times = []
+    for frames, _ in sweeps:
+        start = time.perf_counter()
+        preprocessor.data_urls(frames)
+        times.append(time.perf_counter() - start)
+    report("vlm encode only", times, 0, 0, len(sweeps))
+
+    if client is not None:
+        times, decided, correct = [], 0, 0
+        for frames, expected in sweeps:
+            start = time.perf_counter()
+            index = vlm_select(client, preprocessor, args.target, frames)
+            times.append(time.perf_counter() - start)
+            decided += index is not None
+            correct += index is not None and index == expected
+        report("vlm (encode + call)", times, decided, correct, len(sweeps))
+
+
+if __name__ == "__main__":
+    main()
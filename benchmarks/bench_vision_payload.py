@@ -0,0 +1,102 @@
+"""Measures VLM upload size and encode time for sniper preprocessing settings.
+
+Runs every setting over the same sweep frames and reports the base64
+payload size, encode time and an estimate of visual tokens (28x28 patches,
+as used by Qwen2.5-VL). The first row is the previous behaviour: full
+resolution PNGs read back from disk and base64-encoded.
+
+    python benchmarks/bench_vision_payload.py photos/environment/image_0.png photos/environment/image_1.png ...
+    python benchmarks/bench_vision_payload.py --synthetic 3 --width 1280 --height 720
+"""
+
+import argparse
+import base64
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from brewie.imaging import VisionPreprocessor, encode, vision_tokens  # noqa: E402
+
+SETTINGS = [
+    {"max_side": 0, "fmt": "jpeg", "quality": 90},
+    {"max_side": 1024, "fmt": "jpeg", "quality": 85},
+    {"max_side": 768, "fmt": "jpeg", "quality": 80},
+    {"max_side": 512, "fmt": "jpeg", "quality": 75},
+    {"max_side": 768, "fmt": "webp", "quality": 80},
+    {"max_side": 512, "fmt": "webp", "quality": 70},
+    {"fmt": "jpeg", "quality": 80, "mosaic": True, "mosaic_side": 1536},
+    {"fmt": "jpeg", "quality": 80, "mosaic": True, "mosaic_side": 1024},
+    {"fmt": "webp", "quality": 75, "mosaic": True, "mosaic_side": 1024},
+]
+
+
+def synthetic_frames(count: int, width: int, height: int) -> list[np.ndarray]:
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(count):
+        noise = rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)
+        frame = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        cv2.circle(frame, center, height // 10, (200, 40, 160), -1)
+        frames.append(frame)
+    return frames
+
+
+def describe(setting: dict) -> str:
+    if setting.get("mosaic"):
+        return f"mosaic {setting['mosaic_side']} {setting['fmt']} q{setting['quality']}"
+    side = setting["max_side"] or "full"
+    return f"{side} {setting['fmt']} q{setting['quality']}"
+
+
+def time_it(fn, repeat: int):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="recorded sweep frames")
+    parser.add_argument("--synthetic", type=int, default=3, help="number of synthetic frames if no images are given")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.images:
+        frames = [cv2.imread(path) for path in args.images]
+    else:
+        frames = synthetic_frames(args.synthetic, args.width, args.height)
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames of {width}x{height}")
+    print(f"{'setting':<26} {'payload KiB':>12} {'encode ms':>10} {'~tokens':>8}")
+
+    def png_from_disk():
+        # Old path: PNG at default compression, then base64 of the file bytes
+        return [base64.b64encode(encode(frame, "png")).decode("ascii") for frame in frames]
+
+    payload, seconds = time_it(png_from_disk, args.repeat)
+    tokens = sum(vision_tokens(frame) for frame in frames)
+    size = sum(len(item) for item in payload)
+    print(f"{'full png (previous)':<26} {size / 1024:>12.1f} {1000 * seconds:>10.1f} {tokens:>8}")
+
+    for setting in SETTINGS:
+        preprocessor = VisionPreprocessor(**setting)
+        urls, seconds = time_it(lambda: preprocessor.data_urls(frames), args.repeat)
+        tokens = sum(vision_tokens(image) for image in preprocessor.prepare(frames))
+        size = sum(len(url) for url in urls)
+        print(f"{describe(setting):<26} {size / 1024:>12.1f} {1000 * seconds:>10.1f} {tokens:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Local stand-in for a rosbridge websocket server.
+
+Speaks enough of the rosbridge v2 JSON protocol for roslibpy clients:
+advertise/unadvertise, publish, subscribe/unsubscribe (with
+``throttle_rate``) and a few services through registered handlers.
+Published messages go to ``on_publish`` callbacks and to subscribed
+clients, so a benchmark can play the robot: react to head commands and
+stream camera frames back.
+
+    fake = FakeRosbridge().start()
+    fake.on_publish("/head_tilt_controller/command", lambda msg: ...)
+    fake.publish("/camera/image_raw/compressed", {...})
+"""
+
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+import time
+from typing import Callable
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def ws_frame(opcode: int, payload: bytes) -> bytes:
+    length = len(payload)
+    if length < 126:
+        head = struct.pack(">BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        head = struct.pack(">BBH", 0x80 | opcode, 126, length)
+    else:
+        head = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+    return head + payload
+
+
+def recv_exact(conn: socket.socket, n: int) -> bytes:
+    data = bytearray()
+    while len(data) < n:
+        chunk = conn.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("client closed")
+        data += chunk
+    return bytes(data)
+
+
+def read_frame(conn: socket.socket) -> tuple[int, bytes]:
+    b0, b1 = recv_exact(conn, 2)
+    length = b1 & 0x7F
+    if length == 126:
+        (length,) = struct.unpack(">H", recv_exact(conn, 2))
+    elif length == 127:
+        (length,) = struct.unpack(">Q", recv_exact(conn, 8))
+    mask = recv_exact(conn, 4) if b1 & 0x80 else b""
+    data = recv_exact(conn, length)
+    if b1 & 0x80:
+        # XOR with the repeated 4-byte mask as one big integer
+        key = (mask * (length // 4 + 1))[:length]
+        data = (int.from_bytes(data, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+    return b0 & 0x0F, data
+
+
+class _Connection:
+    def __init__(self, fake, conn: socket.socket):
+        self.fake = fake
+        self.conn = conn
+        self.subscriptions: dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.open = True
+
+    def send(self, message: dict):
+        self.send_raw(0x1, json.dumps(message).encode("utf-8"))
+
+    def send_raw(self, opcode: int, payload: bytes):
+        with self.lock:
+            if not self.open:
+                return
+            try:
+                self.conn.sendall(ws_frame(opcode, payload))
+            except OSError:
+                self.open = False
+
+    def handshake(self):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = self.conn.recv(4096)
+            if not chunk:
+                raise ConnectionError("client closed")
+            request += chunk
+        key = next(
+            line.split(b":", 1)[1].strip()
+            for line in request.split(b"\r\n")
+            if line.lower().startswith(b"sec-websocket-key")
+        )
+        accept = base64.b64encode(hashlib.sha1(key + WS_GUID.encode()).digest())
+        self.conn.sendall(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+            b"Connection: Upgrade\r\nSec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+
+    def serve(self):
+        try:
+            self.handshake()
+            while True:
+                opcode, data = read_frame(self.conn)
+                if opcode == 0x8:
+                    self.send_raw(0x8, b"")
+                    break
+                if opcode == 0x9:
+                    self.send_raw(0xA, data)
+                elif opcode == 0x1:
+                    self.fake._handle(self, json.loads(data))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.open = False
+            self.conn.close()
+            self.fake._drop(self)
+
+
+class FakeRosbridge:
+    """Fake rosbridge on ``host:port`` (port 0 picks a free port).
+
+    ``latency`` delays every message sent to clients, like a slow link.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(8)
+        self.host, self.port = self.sock.getsockname()[:2]
+        self.published: dict[str, int] = {}
+        self.advertised: dict[str, int] = {}
+        self.bytes_sent = 0
+        self._connections: list[_Connection] = []
+        self._handlers: dict[str, list[Callable]] = {}
+        self._services: dict[str, Callable] = {}
+        self._latched: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.sock.close()
+        for connection in list(self._connections):
+            connection.open = False
+            try:
+                connection.conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            connection.conn.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = _Connection(self, conn)
+            with self._lock:
+                self._connections.append(connection)
+            threading.Thread(target=connection.serve, daemon=True).start()
+
+    def _drop(self, connection):
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+
+    def _handle(self, connection: _Connection, message: dict):
+        op = message.get("op")
+        topic = message.get("topic")
+        if op == "advertise":
+            with self._lock:
+                self.advertised[topic] = self.advertised.get(topic, 0) + 1
+        elif op == "subscribe":
+            connection.subscriptions[topic] = {
+                "throttle": message.get("throttle_rate", 0) / 1000.0,
+                "last": 0.0,
+                "id": message.get("id"),
+            }
+            latched = self._latched.get(topic)
+            if latched is not None:
+                connection.send({"op": "publish", "topic": topic, "msg": latched})
+        elif op == "unsubscribe":
+            connection.subscriptions.pop(topic, None)
+        elif op == "publish":
+            with self._lock:
+                self.published[topic] = self.published.get(topic, 0) + 1
+            for handler in self._handlers.get(topic, []):
+                handler(message.get("msg", {}))
+            self.publish(topic, message.get("msg", {}))
+        elif op == "call_service":
+            handler = self._services.get(message.get("service"))
+            reply = {"op": "service_response", "service": message.get("service"), "id": message.get("id")}
+            if handler is None:
+                reply.update(result=False, values=f"Service {message.get('service')} does not exist")
+            else:
+                reply.update(result=True, values=handler(message.get("args", {})))
+            connection.send(reply)
+
+    def on_publish(self, topic: str, handler: Callable[[dict], None]):
+        """Calls ``handler(msg)`` for every message clients publish on ``topic``."""
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def service(self, name: str, handler: Callable[[dict], dict]):
+        self._services[name] = handler
+
+    def subscribers(self, topic: str) -> int:
+        with self._lock:
+            return sum(1 for connection in self._connections if topic in connection.subscriptions)
+
+    def publish(self, topic: str, msg: dict, latch: bool = False):
+        """Sends ``msg`` to every client subscribed to ``topic``."""
+        if latch:
+            self._latched[topic] = msg
+        with self._lock:
+            targets = [c for c in self._connections if topic in c.subscriptions]
+        if not targets:
+            return 0
+        payload = json.dumps({"op": "publish", "topic": topic, "msg": msg}).encode("utf-8")
+        if self.latency:
+            time.sleep(self.latency)
+        now = time.monotonic()
+        sent = 0
+        for connection in targets:
+            subscription = connection.subscriptions.get(topic)
+            if subscription is None:
+                continue
+            if subscription["throttle"] and now - subscription["last"] < subscription["throttle"]:
+                continue
+            subscription["last"] = now
+            connection.send_raw(0x1, payload)
+            sent += 1
+        with self._lock:
+            self.bytes_sent += len(payload) * sent
+        return sent
@@ -0,0 +1,135 @@
+"""Local stand-in for a Solana JSON-RPC endpoint.
+
+Answers the calls BrewPay makes (getHealth, getLatestBlockhash,
+sendTransaction, getSignatureStatuses, getBlockHeight) with plausible
+values and an optional injected latency per method. Signatures become
+"confirmed" ``confirm_after`` seconds after they were sent.
+
+    python benchmarks/fake_solana_rpc.py --port 8899 --latency 0.05
+    BREWIE_SOLANA_RPC=http://127.0.0.1:8899 python server.py
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import base58
+from solders.transaction import Transaction
+
+
+class FakeSolanaRPC:
+    """Fake RPC server on ``host:port`` (port 0 picks a free port)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency=0.0, confirm_after: float = 0.4):
+        # latency is seconds for every method, or a {method: seconds} dict
+        self.latency = latency
+        self.confirm_after = confirm_after
+        self.started = time.monotonic()
+        self.sent: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if isinstance(body, list):
+                    reply = [fake.handle(request) for request in body]
+                else:
+                    reply = fake.handle(body)
+                data = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def slot(self) -> int:
+        # ~400 ms slots
+        return 250_000_000 + int((time.monotonic() - self.started) / 0.4)
+
+    def delay(self, method: str):
+        latency = self.latency.get(method, 0.0) if isinstance(self.latency, dict) else self.latency
+        if latency:
+            time.sleep(latency)
+
+    def handle(self, request: dict) -> dict:
+        method = request["method"]
+        params = request.get("params") or []
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        self.delay(method)
+        slot = self.slot()
+        context = {"slot": slot, "apiVersion": "1.18.0"}
+
+        if method == "getHealth":
+            result = "ok"
+        elif method == "getLatestBlockhash":
+            digest = hashlib.sha256(str(slot).encode()).digest()
+            result = {"context": context, "value": {"blockhash": base58.b58encode(digest).decode(), "lastValidBlockHeight": slot + 150}}
+        elif method == "getBlockHeight":
+            result = slot
+        elif method == "sendTransaction":
+            transaction = Transaction.from_bytes(base64.b64decode(params[0]))
+            result = str(transaction.signatures[0])
+            with self._lock:
+                self.sent[result] = time.monotonic()
+        elif method == "getSignatureStatuses":
+            value = []
+            now = time.monotonic()
+            for signature in params[0]:
+                sent = self.sent.get(signature)
+                if sent is None:
+                    value.append(None)
+                    continue
+                confirmed = now - sent >= self.confirm_after
+                value.append({
+                    "slot": slot,
+                    "confirmations": 1 if confirmed else 0,
+                    "err": None,
+                    "status": {"Ok": None},
+                    "confirmationStatus": "confirmed" if confirmed else "processed",
+                })
+            result = {"context": context, "value": value}
+        else:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32601, "message": f"Method not found: {method}"}}
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    parser.add_argument("--confirm-after", type=float, default=0.4)
+    args = parser.parse_args()
+    fake = FakeSolanaRPC(args.host, args.port, args.latency, args.confirm_after)
+    print(f"Fake Solana RPC on {fake.url}")
+    fake.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
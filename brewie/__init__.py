@@ -0,0 +1 @@
+"""Runtime helpers shared by the Brewie MCP server and voice agent."""
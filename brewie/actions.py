@@ -0,0 +1,113 @@
+"""Always-on cache of the robot's action group catalog.
+
+The robot republishes its action groups on ``/action_groups_data`` about
+once per second. ``ActionCatalog`` stays subscribed and keeps the latest
+message, so tools answer from memory instead of subscribing and polling on
+every call. The version goes up only when the content changes; callers that
+need fresh data wait for a version newer than the one they saw.
+
+``ROS/action_groups.py`` publishes a latched JSON catalog with the frame
+count and duration of every action; the older plain
+``"ActionGroups: a.d6a, b.d6a"`` string is still understood.
+"""
+
+import json
+import threading
+import time
+from typing import Optional
+
+from brewie.metrics import metrics
+
+LEGACY_PREFIX = "ActionGroups:"
+
+
+def parse_catalog(data: str) -> tuple[list[dict], Optional[int]]:
+    """Parses an /action_groups_data string into (actions, publisher version).
+
+    Every action is {"name", "file", "frames", "duration"}; frames and
+    duration (seconds) are None when unknown, e.g. for the legacy format,
+    which also has no version.
+    """
+    data = data.strip()
+    if data.startswith("{"):
+        catalog = json.loads(data)
+        actions = [
+            {
+                "name": entry["name"],
+                "file": entry.get("file", f"{entry['name']}.d6a"),
+                "frames": entry.get("frames"),
+                "duration": entry.get("duration"),
+            }
+            for entry in catalog.get("actions", [])
+        ]
+        return actions, catalog.get("version")
+
+    if data.startswith(LEGACY_PREFIX):
+        data = data[len(LEGACY_PREFIX):]
+    actions = []
+    for file in data.split(","):
+        file = file.strip()
+        if file:
+            name = file[: -len(".d6a")] if file.endswith(".d6a") else file
+            actions.append({"name": name, "file": file, "frames": None, "duration": None})
+    return actions, None
+
+
+class ActionCatalog:
+    """Latest action catalog with a change counter."""
+
+    def __init__(self, topic):
+        self.topic = topic
+        self.message: Optional[dict] = None
+        self.actions: list[dict] = []
+        self.source_version: Optional[int] = None
+        self.version = 0
+        self.updated: Optional[float] = None
+        self.received: Optional[float] = None
+        self._cond = threading.Condition()
+
+    def start(self):
+        self.topic.subscribe(self.on_message)
+
+    def stop(self):
+        self.topic.unsubscribe()
+
+    def on_message(self, message):
+        with self._cond:
+            self.received = time.time()
+            if message == self.message:
+                return
+            try:
+                self.actions, self.source_version = parse_catalog(message.get("data", ""))
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"[Actions] Bad catalog: {e}")
+                return
+            self.message = dict(message)
+            self.version += 1
+            self.updated = self.received
+            metrics.incr("actions.catalog_updates")
+            self._cond.notify_all()
+
+    def duration(self, name: str) -> Optional[float]:
+        """Duration in seconds of action ``name``, None when unknown."""
+        with self._cond:
+            for entry in self.actions:
+                if entry["name"] == name or entry["file"] == name:
+                    return entry["duration"]
+        return None
+
+    def wait(self, newer_than: int = 0, timeout: float = 5.0) -> tuple[list[dict], int]:
+        """Returns (actions, version) once the version is above ``newer_than``.
+
+        The default returns any catalog received so far without waiting.
+        On timeout the current (possibly empty) actions are returned, so the
+        caller can tell from the version whether it changed.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.version <= newer_than:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self.actions, self.version
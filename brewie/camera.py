@@ -0,0 +1,473 @@
+"""Camera frame buffering for the Brewie MCP server.
+
+Frames coming from the rosbridge image topic are stored in a small ring
+buffer together with their header stamp. The payload is kept exactly as it
+arrived and is only base64-decoded and turned into pixels when a consumer
+asks for it; the decoded array is cached on the frame.
+
+The camera topic is only subscribed while frames are wanted. Consumers
+(get_image, sweeps, QR scans) hold ``CameraSubscriber.active()`` and get the
+full frame rate; afterwards the subscription drops to a throttled
+background rate and is closed after an idle timeout.
+"""
+
+import base64
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+import cv2
+import numpy as np
+from roslibpy import Message
+
+from .metrics import metrics
+from .rosbridge import BINARY_COMPRESSIONS, BinaryTopicSubscriber
+
+
+def stamp_to_seconds(header) -> Optional[float]:
+    """Converts a ROS1 or ROS2 header stamp to float seconds."""
+    if not header:
+        return None
+    stamp = header.get("stamp")
+    if not stamp:
+        return None
+    secs = stamp.get("secs", stamp.get("sec", 0))
+    nsecs = stamp.get("nsecs", stamp.get("nanosec", 0))
+    value = secs + nsecs * 1e-9
+    # Drivers that do not fill the header publish a zero stamp
+    return value if value > 0 else None
+
+
+class Frame:
+    """One camera message as received, decoded on demand."""
+
+    __slots__ = (
+        "seq",
+        "stamp",
+        "received",
+        "format",
+        "encoding",
+        "height",
+        "width",
+        "_payload",
+        "_data",
+        "_image",
+        "_lock",
+        "used",
+    )
+
+    def __init__(
+        self,
+        seq: int,
+        message: dict,
+        received: Optional[float] = None,
+        use_header_stamp: bool = True,
+    ):
+        self.seq = seq
+        self.received = time.time() if received is None else received
+        stamp = stamp_to_seconds(message.get("header")) if use_header_stamp else None
+        self.stamp = self.received if stamp is None else stamp
+        self.format = message.get("format")
+        self.encoding = message.get("encoding")
+        self.height = message.get("height")
+        self.width = message.get("width")
+        self._payload = message.get("data")
+        self._data = None
+        self._image = None
+        self._lock = threading.Lock()
+        # Set once a consumer has taken the frame from the buffer
+        self.used = False
+
+    @property
+    def is_compressed(self) -> bool:
+        return self.encoding is None
+
+    @property
+    def data(self):
+        """Payload bytes (JPEG/PNG for compressed topics, pixels otherwise)."""
+        if self._data is None:
+            payload = self._payload
+            if isinstance(payload, str):
+                payload = base64.b64decode(payload)
+            elif isinstance(payload, list):
+                payload = bytes(payload)
+            self._data = payload
+            self._payload = None
+        return self._data
+
+    @property
+    def decoded(self) -> bool:
+        return self._image is not None
+
+    def decode(self) -> Optional[np.ndarray]:
+        """Returns the frame as a BGR (or mono) array, decoding it once.
+
+        Returns None if OpenCV cannot decode the payload and raises
+        ValueError for raw encodings that are not supported.
+        """
+        if self._image is not None:
+            return self._image
+        with self._lock:
+            if self._image is None:
+                self._image = self._decode()
+            return self._image
+
+    def _decode(self) -> Optional[np.ndarray]:
+        if self.data is None:
+            raise ValueError("Unsupported message format.")
+        buf = np.frombuffer(self.data, dtype=np.uint8)
+        if self.is_compressed:
+            return cv2.imdecode(buf, cv2.IMREAD_UNCHANGED)
+
+        height, width = self.height, self.width
+        if self.encoding == "rgb8":
+            return cv2.cvtColor(buf.reshape((height, width, 3)), cv2.COLOR_RGB2BGR)
+        if self.encoding == "bgr8":
+            return buf.reshape((height, width, 3))
+        if self.encoding == "mono8":
+            return buf.reshape((height, width))
+        raise ValueError(f"Unsupported encoding: {self.encoding}")
+
+    def release(self) -> None:
+        """Drops the cached pixels."""
+        self._image = None
+
+
+class FrameBuffer:
+    """Bounded ring of the most recent camera frames.
+
+    ``push`` is called from the rosbridge callback thread and does no
+    decoding work. Consumers look frames up by stamp or block on ``wait_for``
+    until a frame newer than a given time arrives.
+
+    Frames are stamped with their header stamp (``clock="stamp"``), which
+    assumes the robot and the server share a clock. Use ``clock="received"``
+    to stamp frames with the local arrival time when they do not.
+
+    ``used`` counts frames handed to a consumer, ``dropped`` frames that
+    left the buffer without ever being used.
+    """
+
+    def __init__(self, capacity: int = 8, clock: str = "stamp"):
+        if clock not in ("stamp", "received"):
+            raise ValueError(f"Unsupported frame clock: {clock}")
+        self.capacity = capacity
+        self.clock = clock
+        self._frames: deque[Frame] = deque()
+        self._cond = threading.Condition()
+        self._seq = 0
+        self.used = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def push(self, message: dict) -> Frame:
+        with self._cond:
+            frame = Frame(self._seq, message, use_header_stamp=self.clock == "stamp")
+            self._seq += 1
+            self._frames.append(frame)
+            evicted = self._frames.popleft() if len(self._frames) > self.capacity else None
+            self._cond.notify_all()
+        if evicted is not None:
+            self._drop(evicted)
+        return frame
+
+    def clear(self, received_before: Optional[float] = None):
+        """Drops frames received before ``received_before`` (all by default)."""
+        with self._cond:
+            if received_before is None:
+                frames = list(self._frames)
+                self._frames.clear()
+            else:
+                frames = [frame for frame in self._frames if frame.received < received_before]
+                for frame in frames:
+                    self._frames.remove(frame)
+        for frame in frames:
+            self._drop(frame)
+
+    def _drop(self, frame: Frame):
+        if not frame.used:
+            self.dropped += 1
+            metrics.incr("camera.frames_dropped")
+        frame.release()
+
+    def _use(self, frame: Optional[Frame]) -> Optional[Frame]:
+        if frame is not None and not frame.used:
+            frame.used = True
+            self.used += 1
+            metrics.incr("camera.frames_used")
+        return frame
+
+    def latest(self) -> Optional[Frame]:
+        with self._cond:
+            return self._use(self._frames[-1] if self._frames else None)
+
+    def newest_after(self, after: float) -> Optional[Frame]:
+        """Newest frame stamped strictly after ``after``, or None."""
+        with self._cond:
+            return self._use(self._newest_after(after))
+
+    def _newest_after(self, after: Optional[float]) -> Optional[Frame]:
+        if not self._frames:
+            return None
+        frame = self._frames[-1]
+        if after is None or frame.stamp > after:
+            return frame
+        return None
+
+    def frames(self) -> list[Frame]:
+        with self._cond:
+            return list(self._frames)
+
+    def wait_for(self, after: Optional[float] = None, timeout: float = 5.0) -> Optional[Frame]:
+        """Blocks until a frame stamped after ``after`` is buffered.
+
+        With ``after=None`` any buffered frame satisfies the wait. Returns
+        None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                frame = self._newest_after(after)
+                if frame is not None:
+                    return self._use(frame)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+
+def _set_topic_throttle(topic, throttle_rate: int):
+    """Re-subscribes a subscribed roslibpy ``topic`` under its own id with a new rate.
+
+    roslibpy has no public way to do this, so this is the one place that
+    touches its private subscription state. It raises instead of guessing
+    if a roslibpy release renames or removes those attributes.
+    """
+    try:
+        subscribe_id = topic._subscribe_id
+        connect_message = topic._connect_message
+    except AttributeError as e:
+        raise RuntimeError(f"Cannot change the throttle of {topic.name}: unsupported roslibpy version ({e})") from e
+    topic.throttle_rate = throttle_rate
+    if subscribe_id is None:
+        return
+    if connect_message is None or connect_message.get("id") != subscribe_id:
+        raise RuntimeError(f"Cannot change the throttle of {topic.name}: unexpected roslibpy subscribe message")
+    message = Message(dict(connect_message, throttle_rate=throttle_rate))
+    # roslibpy re-sends this message when it reconnects
+    topic._connect_message = message
+    topic.ros.send_on_ready(message)
+
+
+class CameraSubscriber:
+    """Feeds the frame buffer from the camera topic.
+
+    ``transport="json"`` uses the shared roslibpy topic. ``"cbor"`` and
+    ``"cbor-raw"`` open a separate binary rosbridge connection to ``url`` so
+    payloads skip the JSON parse and base64 decode.
+
+    The topic is subscribed on demand: inside ``active()`` at the full
+    rate, otherwise throttled to one frame per ``background_ms`` (0 keeps
+    the full rate) until nothing has used the camera for ``idle_timeout``
+    seconds, then unsubscribed. With ``idle_timeout`` 0 the subscription
+    stays open from ``start()`` on. Frames older than ``max_age`` seconds
+    are not handed out once the rate goes up.
+    """
+
+    def __init__(
+        self,
+        Rclient,
+        imTop,
+        capacity: int = 8,
+        transport: str = "json",
+        url: Optional[str] = None,
+        clock: str = "stamp",
+        background_ms: int = 1000,
+        idle_timeout: float = 30.0,
+        max_age: float = 0.2,
+    ):
+        if transport != "json" and transport not in BINARY_COMPRESSIONS:
+            raise ValueError(f"Unsupported image transport: {transport}")
+        if transport != "json" and url is None:
+            raise ValueError("A rosbridge url is required for binary image transport")
+        self.client = Rclient
+        self.image_topic = imTop
+        self.transport = transport
+        self.url = url
+        self.frames = FrameBuffer(capacity, clock=clock)
+        self.background_ms = background_ms
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.subscribed = False
+        self.throttle_rate = 0
+        self.received = 0
+        self.bytes_received = 0
+        self.subscriptions = 0
+        self._binary = None
+        self._users = 0
+        self._last_used = time.monotonic()
+        self._demand = threading.Condition()
+        self._watcher: Optional[threading.Thread] = None
+        self._running = False
+
+    def on_image_received(self, message):
+        # Callback that is called when a new message is received
+        size = len(message.get("data") or b"")
+        self.received += 1
+        self.bytes_received += size
+        metrics.incr("camera.frames")
+        metrics.incr("camera.bytes", size)
+        self.frames.push(message)
+
+    def start(self):
+        """Starts demand management; subscribes right away when never idle."""
+        with self._demand:
+            self._running = True
+            if self.idle_timeout <= 0:
+                self._subscribe(self.background_ms)
+            elif self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="camera-idle", daemon=True)
+                self._watcher.start()
+
+    def stop(self):
+        """Ends demand management and closes the subscription."""
+        with self._demand:
+            self._running = False
+            if self.subscribed:
+                self.unsubs()
+            self._demand.notify_all()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    @contextmanager
+    def active(self):
+        """Full frame rate while the block runs (get_image, sweeps, QR scans).
+
+        Stale frames from before the rate went up are dropped, so the block
+        only sees current ones; a recent background frame is kept.
+        """
+        with self._demand:
+            self._users += 1
+            if self._users == 1 and (not self.subscribed or self.throttle_rate):
+                self.frames.clear(None if not self.subscribed else time.time() - self.max_age)
+                self._subscribe(0)
+        try:
+            yield self
+        finally:
+            with self._demand:
+                self._users -= 1
+                self._last_used = time.monotonic()
+                if self._users == 0 and self.background_ms:
+                    self._subscribe(self.background_ms)
+                self._demand.notify_all()
+
+    def _subscribe(self, throttle_rate: int):
+        """Subscribes, or changes the rate of the open subscription (holding the lock)."""
+        if self.subscribed:
+            if throttle_rate != self.throttle_rate:
+                self.throttle(throttle_rate)
+            return
+        self.subs(throttle_rate)
+
+    def _watch(self):
+        with self._demand:
+            while self._running:
+                if not self.subscribed or self._users:
+                    self._demand.wait()
+                    continue
+                idle = time.monotonic() - self._last_used
+                if idle < self.idle_timeout:
+                    self._demand.wait(self.idle_timeout - idle)
+                    continue
+                self.unsubs()
+                print(f"[Camera] Idle for {self.idle_timeout:g}s, unsubscribed {self.image_topic.name}")
+
+    def status(self) -> dict:
+        return {
+            "subscribed": self.subscribed,
+            "throttle_ms": self.throttle_rate,
+            "users": self._users,
+            "subscriptions": self.subscriptions,
+            "frames": self.received,
+            "bytes": self.bytes_received,
+            "frames_used": self.frames.used,
+            "frames_dropped": self.frames.dropped,
+        }
+
+    def get_last_image(self) -> Optional[Frame]:
+        # Method that returns the last buffered frame
+        return self.frames.latest()
+
+    def wait_for_frame(self, after: Optional[float] = None, timeout: float = 5.0) -> Optional[Frame]:
+        return self.frames.wait_for(after, timeout)
+
+    def wait_for_fresh_frame(
+        self,
+        command_time: float,
+        settle: float = 0.0,
+        timeout: float = 3.0,
+        joint=None,
+        target: Optional[float] = None,
+        tolerance: float = 0.03,
+    ) -> Optional[Frame]:
+        """Frame barrier after a head command sent at ``command_time``.
+
+        Returns a frame stamped after ``command_time + settle``. When a
+        ``brewie.head.JointMonitor`` and its ``target`` are given, the wait
+        ends as soon as the joint reports the target position and a frame
+        newer than that moment arrives, which is usually well before the
+        settle time. Returns None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        after = command_time + settle
+        if joint is not None and target is not None:
+            # Keep some of the budget for the frame itself
+            joint_timeout = timeout - min(0.5, timeout / 2)
+            reached = joint.wait_until(target, tolerance, joint_timeout, since=command_time)
+            if reached is not None:
+                after = reached
+        return self.frames.wait_for(after, max(0.0, deadline - time.monotonic()))
+
+    def subs(self, throttle_rate: int = 0):
+        self.subscribed = True
+        self.throttle_rate = throttle_rate
+        self.subscriptions += 1
+        metrics.incr("camera.subscribe")
+        if self.transport == "json":
+            self.image_topic.throttle_rate = throttle_rate
+            self.image_topic.subscribe(self.on_image_received)
+            return
+        self._binary = BinaryTopicSubscriber(
+            self.url,
+            self.image_topic.name,
+            self.image_topic.message_type,
+            self.on_image_received,
+            compression=self.transport,
+            throttle_rate=throttle_rate,
+        )
+        self._binary.start()
+
+    def throttle(self, throttle_rate: int):
+        """Changes the rate of the open subscription without unsubscribing.
+
+        rosbridge updates a subscription in place when it is subscribed
+        again under the same id.
+        """
+        self.throttle_rate = throttle_rate
+        if self._binary is not None:
+            self._binary.set_throttle(throttle_rate)
+            return
+        _set_topic_throttle(self.image_topic, throttle_rate)
+
+    def unsubs(self):
+        self.subscribed = False
+        if self._binary is not None:
+            self._binary.stop()
+            self._binary = None
+        else:
+            self.image_topic.unsubscribe()
@@ -0,0 +1,98 @@
+"""Local color/blob target selection that can answer sniper without the VLM.
+
+Targets like "purple ball" or "red cup" name a color. Each sweep frame is
+downscaled, converted to HSV and masked against that color's hue range;
+the frame with the largest connected blob wins when it clearly beats the
+others. Anything less clear-cut is left to the VLM.
+"""
+
+import re
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from .imaging import resize_max_side
+
+# OpenCV hue is 0-179
+COLOR_HUES = {
+    "red": [(0, 10), (170, 180)],
+    "orange": [(10, 22)],
+    "yellow": [(22, 35)],
+    "green": [(35, 85)],
+    "cyan": [(85, 100)],
+    "blue": [(100, 130)],
+    "purple": [(130, 155)],
+    "violet": [(130, 155)],
+    "pink": [(155, 170)],
+    "magenta": [(150, 170)],
+}
+
+
+def target_color(target: str, max_words: int = 3) -> Optional[str]:
+    """The color named in a short target description, e.g. "the purple ball".
+
+    Longer descriptions ("man in a red shirt holding a cup") return None,
+    the color alone does not identify them.
+    """
+    words = re.findall(r"[a-z]+", target.lower())
+    colors = [word for word in words if word in COLOR_HUES]
+    if len(colors) != 1 or len(words) > max_words:
+        return None
+    return colors[0]
+
+
+def color_mask(image: np.ndarray, color: str, min_saturation: int = 80, min_value: int = 50) -> np.ndarray:
+    """Boolean mask of the pixels of ``image`` (BGR) that have ``color``.
+
+    Gray and BGRA images are converted to BGR first.
+    """
+    if image.ndim == 2 or image.shape[2] == 1:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    elif image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    hue, saturation, value = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    mask = np.zeros(hue.shape, dtype=bool)
+    for low, high in COLOR_HUES[color]:
+        mask |= (hue >= low) & (hue < high)
+    return mask & (saturation >= min_saturation) & (value >= min_value)
+
+
+def blob_score(mask: np.ndarray) -> float:
+    """Area of the largest connected blob as a fraction of the frame."""
+    if not mask.any():
+        return 0.0
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask.view(np.uint8), connectivity=8)
+    return float(stats[1:count, cv2.CC_STAT_AREA].max()) / mask.size
+
+
+class ColorPrefilter:
+    """Picks the sweep frame showing a colored target, when it is obvious.
+
+    Confidence is ``1 - second / best`` of the per-frame blob scores, so
+    0.6 means the best frame's blob is 2.5 times larger than any other.
+    Frames are scored at ``max_side`` pixels; blobs under ``min_area`` of
+    the frame are ignored.
+    """
+
+    def __init__(self, threshold: float = 0.6, min_area: float = 0.002, max_side: int = 160):
+        self.threshold = threshold
+        self.min_area = min_area
+        self.max_side = max_side
+
+    def scores(self, color: str, images: list[np.ndarray]) -> list[float]:
+        return [blob_score(color_mask(resize_max_side(image, self.max_side), color)) for image in images]
+
+    def select(self, target: str, images: list[np.ndarray]) -> tuple[Optional[int], float]:
+        """Returns (frame index, confidence); the index is None below threshold."""
+        color = target_color(target)
+        if color is None or not images:
+            return None, 0.0
+        scores = self.scores(color, images)
+        best = int(np.argmax(scores))
+        if scores[best] < self.min_area:
+            return None, 0.0
+        second = max((score for i, score in enumerate(scores) if i != best), default=0.0)
+        confidence = 1.0 - second / scores[best]
+        return (best if confidence >= self.threshold else None), confidence
@@ -0,0 +1,169 @@
+"""Runs robot action groups one after another and knows when each is done.
+
+``/app/set_action`` only starts an action group; nothing reports its end.
+``ActionExecutor`` feeds actions from one FIFO to the robot: an action is
+done when the completion topic says so (when configured) or when its
+duration from the action catalog has passed. The next queued action is
+published right then, so back-to-back actions run without guessed sleeps,
+and callers can wait on the job for an accurate "done".
+"""
+
+import itertools
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+from brewie.metrics import metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+TIMEOUT = "timeout"
+
+
+class ActionJob:
+    """One requested action group and its progress."""
+
+    def __init__(self, job_id: int, name: str, duration: Optional[float]):
+        self.id = job_id
+        self.name = name
+        # Catalog duration in seconds, None when the catalog does not know it
+        self.duration = duration
+        self.state = QUEUED
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _finish(self, state: str):
+        self.state = state
+        self.finished = time.time()
+        self._done.set()
+
+    def status(self) -> dict:
+        status = {
+            "id": self.id,
+            "action": self.name,
+            "state": self.state,
+            "duration": self.duration,
+        }
+        if self.started is not None and self.finished is None and self.duration is not None:
+            status["remaining"] = round(max(0.0, self.started + self.duration - time.time()), 3)
+        if self.finished is not None:
+            status["seconds"] = round(self.finished - (self.started or self.submitted), 3)
+        return status
+
+
+class ActionExecutor:
+    """Plays queued actions on ``topic`` without overlap.
+
+    ``durations(name)`` returns the catalog duration in seconds or None;
+    unknown actions take ``default_duration``. With ``done_topic`` set, an
+    action finishes on a message whose ``data`` is empty or names it, and
+    the duration (plus ``done_timeout``) only bounds the wait.
+    """
+
+    def __init__(
+        self,
+        topic,
+        durations: Callable[[str], Optional[float]],
+        done_topic=None,
+        default_duration: float = 2.0,
+        margin: float = 0.05,
+        done_timeout: float = 2.0,
+        keep: int = 100,
+    ):
+        self.topic = topic
+        self.durations = durations
+        self.done_topic = done_topic
+        self.default_duration = default_duration
+        self.margin = margin
+        self.done_timeout = done_timeout
+        self.keep = keep
+        self.current: Optional[ActionJob] = None
+        self._ids = itertools.count(1)
+        self._jobs: dict[int, ActionJob] = {}
+        self._queue: "queue.Queue[ActionJob]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._completed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.done_topic is not None:
+            self.done_topic.subscribe(self.on_done)
+
+    def stop(self):
+        if self.done_topic is not None:
+            self.done_topic.unsubscribe()
+
+    def on_done(self, message):
+        job = self.current
+        if job is None:
+            return
+        data = message.get("data", "")
+        if not data or data in (job.name, f"{job.name}.d6a"):
+            self._completed.set()
+
+    def submit(self, name: str) -> ActionJob:
+        with self._lock:
+            job = ActionJob(next(self._ids), name, self.durations(name))
+            self._jobs[job.id] = job
+            finished = [j.id for j in self._jobs.values() if j.done]
+            for old in finished[: max(0, len(finished) - self.keep)]:
+                del self._jobs[old]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="action-executor", daemon=True)
+                self._thread.start()
+        self._queue.put(job)
+        metrics.incr("actions.submitted")
+        return job
+
+    def get(self, job_id: int) -> Optional[ActionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[ActionJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def pending(self) -> list[ActionJob]:
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.done]
+
+    def _play(self, job: ActionJob) -> str:
+        duration = self.default_duration if job.duration is None else job.duration
+        self._completed.clear()
+        self.current = job
+        job.state = RUNNING
+        job.started = time.time()
+        # The end is planned from before the publish, so publish overhead
+        # does not add up over a queue
+        end = time.monotonic() + duration + self.margin
+        self.topic.publish({'data': job.name})
+        if self.done_topic is None:
+            time.sleep(max(0.0, end - time.monotonic()))
+            return DONE
+        if self._completed.wait(duration + self.done_timeout):
+            return DONE
+        return TIMEOUT
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                state = self._play(job)
+            except Exception as e:
+                print(f"[Actions] {job.name} failed: {e}")
+                state = TIMEOUT
+            self.current = None
+            job._finish(state)
+            metrics.observe("actions.run", job.finished - job.started)
+            metrics.incr(f"actions.{state}")
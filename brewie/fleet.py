@@ -0,0 +1,150 @@
+"""Several robots from one server process.
+
+Each robot in ``BREWIE_ROBOTS`` ("alpha=10.0.0.11:9090,beta=10.0.0.12")
+gets its own rosbridge connection, opened the first time a tool uses the
+robot. Its topics, camera subscriber, action executor and motion scheduler
+are created then too, by the ``build`` function the server passes in, so
+robots that are never addressed cost nothing. roslibpy keeps each
+connection alive and reconnects it on its own.
+"""
+
+import asyncio
+import threading
+from typing import Callable, Iterable, Optional
+
+import roslibpy
+
+
+def parse_robots(text: str, default_host: str, default_port: int) -> dict[str, tuple[str, int]]:
+    """Parses "id=host[:port],..." into {id: (host, port)}.
+
+    An empty string is a single robot "brewie" at the default host and port.
+    """
+    robots = {}
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        robot_id, _, address = part.partition("=")
+        if not address:
+            raise ValueError(f"Robot entry {part!r} is not id=host[:port]")
+        host, _, port = address.strip().partition(":")
+        robots[robot_id.strip()] = (host, int(port) if port else default_port)
+    return robots or {"brewie": (default_host, default_port)}
+
+
+class Robot:
+    """One robot: its rosbridge connection and, once ready, its parts.
+
+    ``build(robot)`` sets the parts (topics, camera, executors) as
+    attributes on the robot after it has connected. It registers how to
+    stop each part it starts with ``on_failure``; when a later step raises,
+    those parts are stopped again so the next ``start`` builds from scratch.
+    """
+
+    def __init__(self, robot_id: str, host: str, port: int, build: Callable[["Robot"], None]):
+        self.id = robot_id
+        self.host = host
+        self.port = port
+        self.ros: Optional[roslibpy.Ros] = None
+        self._build = build
+        self._ready = False
+        self._lock = threading.Lock()
+        self._stops: list[Callable[[], None]] = []
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    def start(self, timeout: float = 10.0) -> "Robot":
+        """Connects and builds the robot's parts on first use."""
+        if self._ready:
+            return self
+        with self._lock:
+            if not self._ready:
+                if self.ros is None:
+                    self.ros = roslibpy.Ros(host=self.host, port=self.port)
+                # Keeps reconnecting in the background when this times out
+                self.ros.run(timeout)
+                try:
+                    self._build(self)
+                except Exception:
+                    self._teardown()
+                    raise
+                self._stops.clear()
+                self._ready = True
+                print(f"[Fleet] Robot {self.id} ready at {self.url}")
+        return self
+
+    def on_failure(self, stop: Callable[[], None]):
+        """Registers ``stop`` to undo a started part if the build fails later."""
+        self._stops.append(stop)
+
+    def _teardown(self):
+        while self._stops:
+            stop = self._stops.pop()
+            try:
+                stop()
+            except Exception as e:
+                print(f"[Fleet] Robot {self.id} cleanup error: {e}")
+
+    def status(self) -> dict:
+        return {
+            "id": self.id,
+            "url": self.url,
+            "ready": self._ready,
+            "connected": self.ros is not None and self.ros.is_connected,
+        }
+
+
+class Fleet:
+    """Robots by id; the empty id is the default robot."""
+
+    def __init__(
+        self,
+        robots: dict[str, tuple[str, int]],
+        build: Callable[[Robot], None],
+        default: str = "",
+        connect_timeout: float = 10.0,
+    ):
+        self.robots = {robot_id: Robot(robot_id, host, port, build) for robot_id, (host, port) in robots.items()}
+        self.default = default or next(iter(self.robots))
+        if self.default not in self.robots:
+            raise ValueError(f"Default robot {self.default} is not in the fleet")
+        self.connect_timeout = connect_timeout
+
+    def ids(self) -> list[str]:
+        return list(self.robots)
+
+    def get(self, robot_id: str = "") -> Robot:
+        """The robot by id, raising KeyError for unknown ids."""
+        return self.robots[robot_id or self.default]
+
+    def start(self, robot_id: str = "") -> Robot:
+        return self.get(robot_id).start(self.connect_timeout)
+
+    def select(self, robot_ids: str = "") -> list[str]:
+        """Comma-separated ids to a list; empty means every robot."""
+        ids = [robot_id.strip() for robot_id in robot_ids.split(",") if robot_id.strip()]
+        for robot_id in ids:
+            self.get(robot_id)
+        return ids or self.ids()
+
+    async def broadcast(self, robot_ids: Iterable[str], call) -> dict:
+        """Awaits ``call(robot_id)`` for every robot at once.
+
+        Returns {robot id: result}; a failed call's result is its error.
+        """
+        robot_ids = list(robot_ids)
+        results = await asyncio.gather(*(call(robot_id) for robot_id in robot_ids), return_exceptions=True)
+        return {
+            robot_id: f"Error: {result}" if isinstance(result, Exception) else result
+            for robot_id, result in zip(robot_ids, results)
+        }
+
+    def status(self) -> list[dict]:
+        return [dict(robot.status(), default=robot.id == self.default) for robot in self.robots.values()]
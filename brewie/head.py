@@ -0,0 +1,88 @@
+"""Head joint state tracking.
+
+The head controllers publish their state next to the command topic
+(``/head_pan_controller/state``). ``JointMonitor`` keeps the latest position
+so callers can wait for the joint to reach its target instead of sleeping
+for a guessed duration.
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+def joint_position(message: dict, joint: Optional[str] = None) -> Optional[float]:
+    """Extracts a joint position from a controller state message.
+
+    Understands dynamixel_msgs/JointState (``current_pos``),
+    control_msgs/JointControllerState (``process_value``) and
+    sensor_msgs/JointState (``name``/``position`` lists).
+    """
+    for key in ("current_pos", "process_value"):
+        if key in message:
+            return float(message[key])
+    position = message.get("position")
+    if isinstance(position, list):
+        if not position:
+            return None
+        names = message.get("name") or []
+        if joint is not None and joint in names:
+            return float(position[names.index(joint)])
+        return float(position[0])
+    if position is not None:
+        return float(position)
+    return None
+
+
+class JointMonitor:
+    """Latest position of one joint, fed from its state topic."""
+
+    def __init__(self, topic, joint: Optional[str] = None):
+        self.topic = topic
+        self.joint = joint
+        self.position: Optional[float] = None
+        self.moving: Optional[bool] = None
+        self.updated: Optional[float] = None
+        self._cond = threading.Condition()
+
+    def start(self):
+        self.topic.subscribe(self.on_state)
+
+    def stop(self):
+        self.topic.unsubscribe()
+
+    def on_state(self, message):
+        position = joint_position(message, self.joint)
+        if position is None:
+            return
+        with self._cond:
+            self.position = position
+            self.moving = message.get("is_moving")
+            self.updated = time.time()
+            self._cond.notify_all()
+
+    def _reached(self, target: float, tolerance: float, since: float) -> bool:
+        if self.position is None or self.updated is None or self.updated < since:
+            return False
+        if self.moving:
+            return False
+        return abs(self.position - target) <= tolerance
+
+    def wait_until(self, target: float, tolerance: float = 0.03, timeout: float = 2.0, since: Optional[float] = None) -> Optional[float]:
+        """Waits for a state within ``tolerance`` of ``target``.
+
+        Only states received after ``since`` count. Returns the time the
+        joint was seen at the target, or None on timeout or when the state
+        topic has never published (so callers fall back immediately).
+        """
+        since = time.time() if since is None else since
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self.position is None:
+                return None
+            while not self._reached(target, tolerance, since):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self.updated
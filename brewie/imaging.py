@@ -0,0 +1,180 @@
+"""Image encoding helpers for frames handed to clients and models.
+
+Camera frames usually arrive JPEG-compressed already. These helpers pass
+those bytes through untouched and only decode/re-encode when a caller asks
+for a different size or format.
+"""
+
+import base64
+from typing import Optional
+
+import cv2
+import numpy as np
+
+ENCODINGS = ("jpeg", "png", "webp")
+
+
+def frame_codec(frame) -> Optional[str]:
+    """Codec of a compressed frame ("jpeg" or "png"), None for raw frames."""
+    if not frame.is_compressed:
+        return None
+    # rosbridge formats look like "jpeg", "png" or "rgb8; jpeg compressed bgr8"
+    return "png" if frame.format and "png" in frame.format.lower() else "jpeg"
+
+
+def resize_max_side(image: np.ndarray, max_side: int) -> np.ndarray:
+    """Downscales ``image`` so its longer side is at most ``max_side``."""
+    height, width = image.shape[:2]
+    longest = max(height, width)
+    if not max_side or longest <= max_side:
+        return image
+    scale = max_side / longest
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def encode(image: np.ndarray, fmt: str = "jpeg", quality: int = 85) -> bytes:
+    """Encodes pixels as JPEG/WebP at ``quality`` (0-100) or PNG."""
+    if fmt == "jpeg":
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    elif fmt == "webp":
+        ok, encoded = cv2.imencode(".webp", image, [cv2.IMWRITE_WEBP_QUALITY, quality])
+    elif fmt == "png":
+        ok, encoded = cv2.imencode(".png", image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    else:
+        raise ValueError(f"Unsupported image format: {fmt}")
+    if not ok:
+        raise ValueError(f"Failed to encode image as {fmt}")
+    return encoded.tobytes()
+
+
+def frame_bytes(frame, max_side: int = 0, fmt: Optional[str] = None, quality: int = 85) -> tuple[bytes, str]:
+    """Returns (encoded bytes, format) for ``frame``.
+
+    The camera's own bytes are returned when no resize is requested and the
+    requested format matches (or none is requested); otherwise the frame is
+    decoded once (cached on the frame) and re-encoded.
+    """
+    if fmt is not None and fmt not in ENCODINGS:
+        raise ValueError(f"Unsupported image format: {fmt}")
+    codec = frame_codec(frame)
+    if codec is not None and not max_side and fmt in (None, codec):
+        return bytes(frame.data), codec
+
+    image = frame.decode()
+    if image is None:
+        raise ValueError("Failed to decode image")
+    fmt = fmt or codec or "jpeg"
+    return encode(resize_max_side(image, max_side), fmt, quality), fmt
+
+
+def mime_type(fmt: str) -> str:
+    return f"image/{fmt}"
+
+
+def vision_tokens(image: np.ndarray, patch: int = 28) -> int:
+    """Rough visual token count of an image for Qwen2.5-VL style models."""
+    height, width = image.shape[:2]
+    return -(-height // patch) * -(-width // patch)
+
+
+def mosaic(images: list[np.ndarray], max_side: int = 1536, labels: Optional[list[str]] = None) -> np.ndarray:
+    """Tiles ``images`` into one labeled grid no larger than ``max_side``.
+
+    Tiles keep the first image's aspect ratio and are numbered 0..N-1 (or
+    with ``labels``) in their top-left corner. Up to three images form a
+    single row, larger sets a near-square grid.
+    """
+    count = len(images)
+    cols = count if count <= 3 else int(np.ceil(np.sqrt(count)))
+    rows = -(-count // cols)
+    height, width = images[0].shape[:2]
+    scale = min(1.0, max_side / max(cols * width, rows * height)) if max_side else 1.0
+    tile_w, tile_h = max(1, int(width * scale)), max(1, int(height * scale))
+
+    grid = np.zeros((rows * tile_h, cols * tile_w, 3), dtype=np.uint8)
+    font_scale = max(0.5, tile_h / 240)
+    thickness = max(1, int(font_scale * 2))
+    for index, image in enumerate(images):
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        elif image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+        tile = cv2.resize(image, (tile_w, tile_h), interpolation=cv2.INTER_AREA)
+        label = labels[index] if labels else str(index)
+        (text_w, text_h), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        cv2.rectangle(tile, (0, 0), (text_w + 8, text_h + baseline + 8), (0, 0, 0), -1)
+        cv2.putText(tile, label, (4, text_h + 4), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), thickness)
+        row, col = divmod(index, cols)
+        grid[row * tile_h : (row + 1) * tile_h, col * tile_w : (col + 1) * tile_w] = tile
+    return grid
+
+
+class VisionPreprocessor:
+    """Shrinks and re-encodes sweep frames before they are sent to a VLM.
+
+    Each frame is downscaled to ``max_side`` and encoded as ``fmt`` at
+    ``quality``. With ``mosaic=True`` all frames are tiled into a single
+    numbered image of at most ``mosaic_side`` pixels instead, which costs
+    one image's worth of request overhead and far fewer visual tokens.
+    """
+
+    def __init__(
+        self,
+        max_side: int = 768,
+        fmt: str = "jpeg",
+        quality: int = 80,
+        mosaic: bool = False,
+        mosaic_side: int = 1536,
+    ):
+        if fmt not in ENCODINGS:
+            raise ValueError(f"Unsupported image format: {fmt}")
+        self.max_side = max_side
+        self.fmt = fmt
+        self.quality = quality
+        self.mosaic = mosaic
+        self.mosaic_side = mosaic_side
+
+    def prepare(self, images: list[np.ndarray]) -> list[np.ndarray]:
+        """Resized images (or the single mosaic) that will be encoded."""
+        if self.mosaic:
+            return [mosaic(images, self.mosaic_side)]
+        return [resize_max_side(image, self.max_side) for image in images]
+
+    def encode(self, images: list[np.ndarray]) -> list[bytes]:
+        return [encode(image, self.fmt, self.quality) for image in self.prepare(images)]
+
+    def data_urls(self, images: list[np.ndarray]) -> list[str]:
+        mime = mime_type(self.fmt)
+        return [f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}" for data in self.encode(images)]
+
+    def encode_frame(self, image: np.ndarray):
+        """Per-frame work that can run while the next frame is captured.
+
+        Returns the frame's data URL, or the image itself in mosaic mode
+        where tiling has to wait for the whole set; pass the results to
+        ``finish``.
+        """
+        if self.mosaic:
+            return image
+        return self.data_urls([image])[0]
+
+    def finish(self, encoded: list) -> list[str]:
+        """Data URLs for the request from ``encode_frame`` results."""
+        if self.mosaic:
+            return self.data_urls(encoded)
+        return list(encoded)
+
+    def prompt(self, target: str, count: int) -> str:
+        """Target selection prompt matching the prepared image layout."""
+        numbers = ",".join(str(i) for i in range(count))
+        if self.mosaic:
+            layout = f"You see one image made of {count} numbered photos ({numbers}), the number is in the top-left corner of each photo."
+        else:
+            layout = f"You see {count} photos ({numbers})."
+        return (
+            layout
+            + " Return only the number of the photo in which, in your opinion, the object most closely resembles "
+            + target
+            + ". The answer should only be the number without additional words."
+        )
@@ -0,0 +1,78 @@
+"""Process-wide counters and timings exposed through the get_metrics tool."""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted ``values`` (0 < q <= 1)."""
+    return values[min(len(values) - 1, max(0, int(round(q * len(values))) - 1))]
+
+
+class Metrics:
+    """Thread-safe named counters plus count/total/last/max timings.
+
+    The last ``samples`` observations of each timing are kept for
+    p50/p95/p99.
+    """
+
+    def __init__(self, samples: int = 1024):
+        self.samples = samples
+        self._counters: dict[str, int] = {}
+        self._timings: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = {
+                    "count": 0,
+                    "total": 0.0,
+                    "last": 0.0,
+                    "max": 0.0,
+                    "samples": deque(maxlen=self.samples),
+                }
+            timing["count"] += 1
+            timing["samples"].append(seconds)
+            timing["total"] += seconds
+            timing["last"] = seconds
+            timing["max"] = max(timing["max"], seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            timings = {}
+            for name, t in self._timings.items():
+                samples = sorted(t["samples"])
+                timings[name] = {
+                    "count": t["count"],
+                    "avg_ms": round(1000 * t["total"] / t["count"], 2),
+                    "last_ms": round(1000 * t["last"], 2),
+                    "max_ms": round(1000 * t["max"], 2),
+                    "p50_ms": round(1000 * percentile(samples, 0.50), 2),
+                    "p95_ms": round(1000 * percentile(samples, 0.95), 2),
+                    "p99_ms": round(1000 * percentile(samples, 0.99), 2),
+                }
+            return {"counters": dict(self._counters), "timings": timings}
+
+
+metrics = Metrics()
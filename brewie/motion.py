@@ -0,0 +1,221 @@
+"""Timed robot motions off the MCP event loop.
+
+FastMCP calls sync tools directly on its event loop, so a tool that sleeps
+between joystick and head commands stalls every other request. Motions are
+instead described as a ``Timeline`` of calls at offsets from its start and
+handed to ``MotionScheduler``: a dedicated thread fires the steps on time,
+and longer blocking work (sweeps, QR scans, payments) runs as a task on a
+small worker pool. Each job names the resources it moves ("head", "legs");
+jobs sharing one wait their turn in order, others run side by side. Tools
+get a ``MotionJob`` back and can await it or return its id.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Optional
+
+from brewie.metrics import metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Timeline:
+    """Calls planned at offsets in seconds from the start of a motion."""
+
+    def __init__(self, name: str, resources: Iterable[str] = ("head",)):
+        self.name = name
+        self.resources = frozenset(resources)
+        self.steps: list[tuple[float, Callable, tuple]] = []
+        self.length = 0.0
+
+    def at(self, offset: float, fn: Callable, *args) -> "Timeline":
+        self.steps.append((offset, fn, args))
+        self.length = max(self.length, offset)
+        return self
+
+    def hold(self, offset: float) -> "Timeline":
+        """Keeps the resources until ``offset``, e.g. while a joint settles."""
+        self.length = max(self.length, offset)
+        return self
+
+    def play(self):
+        """Runs the steps on the calling thread (for use inside a task)."""
+        start = time.monotonic()
+        for offset, fn, args in sorted(self.steps, key=lambda step: step[0]):
+            time.sleep(max(0.0, start + offset - time.monotonic()))
+            fn(*args)
+        time.sleep(max(0.0, start + self.length - time.monotonic()))
+
+
+class MotionJob:
+    """One submitted timeline or task; awaitable from async tools."""
+
+    def __init__(self, job_id: int, name: str, resources: frozenset):
+        self.id = job_id
+        self.name = name
+        self.resources = resources
+        self.state = QUEUED
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.future: Future = Future()
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        wait([self.future], timeout)
+        return self.future.done()
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+    def status(self) -> dict:
+        status = {
+            "id": self.id,
+            "motion": self.name,
+            "resources": sorted(self.resources),
+            "state": self.state,
+        }
+        if self.started is not None:
+            status["queued_seconds"] = round(self.started - self.submitted, 3)
+        if self.finished is not None:
+            status["seconds"] = round(self.finished - (self.started or self.submitted), 3)
+        if self.error:
+            status["error"] = self.error
+        return status
+
+
+class MotionScheduler:
+    """Runs timelines on one scheduler thread and tasks on ``workers`` threads.
+
+    A job starts once none of its resources is used by a running job or by
+    an earlier queued one, so conflicting motions keep their order. The
+    last ``keep`` finished jobs stay queryable.
+    """
+
+    def __init__(self, workers: int = 2, keep: int = 100):
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="motion-task")
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._jobs: dict[int, MotionJob] = {}
+        # (job, timeline or None, task or None) waiting for their resources
+        self._waiting: list[tuple[MotionJob, Optional[Timeline], Optional[tuple]]] = []
+        self._busy: set[str] = set()
+        # (due, seq, job, fn, args); fn None marks the end of a timeline
+        self._steps: list[tuple[float, int, MotionJob, Optional[Callable], tuple]] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, timeline: Timeline) -> MotionJob:
+        """Queues ``timeline``; its steps fire on the scheduler thread."""
+        return self._enqueue(timeline.name, timeline.resources, timeline, None)
+
+    def run(self, name: str, resources: Iterable[str], fn: Callable[..., Any], *args) -> MotionJob:
+        """Queues ``fn(*args)`` to run on a worker once ``resources`` are free.
+
+        The job's result is the return value of ``fn``.
+        """
+        return self._enqueue(name, frozenset(resources), None, (fn, args))
+
+    def get(self, job_id: int) -> Optional[MotionJob]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[MotionJob]:
+        with self._cond:
+            return list(self._jobs.values())
+
+    def _enqueue(self, name, resources, timeline, task) -> MotionJob:
+        with self._cond:
+            job = MotionJob(next(self._ids), name, resources)
+            self._jobs[job.id] = job
+            finished = [j.id for j in self._jobs.values() if j.done]
+            for old in finished[: max(0, len(finished) - self.keep)]:
+                del self._jobs[old]
+            self._waiting.append((job, timeline, task))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="motion-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        metrics.incr("motion.submitted")
+        return job
+
+    def _start_ready(self):
+        """Starts waiting jobs whose resources are free (holding the lock)."""
+        blocked: set[str] = set()
+        still_waiting = []
+        for job, timeline, task in self._waiting:
+            if job.resources & (self._busy | blocked):
+                blocked |= job.resources
+                still_waiting.append((job, timeline, task))
+                continue
+            self._busy |= job.resources
+            job.state = RUNNING
+            job.started = time.time()
+            metrics.observe("motion.queue_wait", job.started - job.submitted)
+            if timeline is not None:
+                start = time.monotonic()
+                for offset, fn, args in timeline.steps:
+                    heapq.heappush(self._steps, (start + offset, next(self._seq), job, fn, args))
+                heapq.heappush(self._steps, (start + timeline.length, next(self._seq), job, None, ()))
+            else:
+                fn, args = task
+                self._pool.submit(self._task, job, fn, args)
+        self._waiting = still_waiting
+
+    def _finish(self, job: MotionJob, result: Any = None, error: Optional[str] = None):
+        with self._cond:
+            self._busy -= job.resources
+            job.state = FAILED if error else DONE
+            job.error = error
+            job.finished = time.time()
+            self._cond.notify_all()
+        metrics.observe("motion.run", job.finished - job.started)
+        if error:
+            print(f"[Motion] {job.name} failed: {error}")
+            job.future.set_exception(RuntimeError(error))
+        else:
+            job.future.set_result(result)
+
+    def _task(self, job: MotionJob, fn: Callable, args: tuple):
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self._finish(job, error=str(e))
+        else:
+            self._finish(job, result)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._start_ready()
+                now = time.monotonic()
+                due = []
+                while self._steps and self._steps[0][0] <= now:
+                    due.append(heapq.heappop(self._steps))
+                if not due:
+                    self._cond.wait(self._steps[0][0] - now if self._steps else None)
+                    continue
+            for planned, _, job, fn, args in due:
+                if job.done:
+                    continue
+                if fn is None:
+                    self._finish(job, error=job.error)
+                    continue
+                metrics.observe("motion.step_lag", time.monotonic() - planned)
+                try:
+                    fn(*args)
+                except Exception as e:
+                    # Later steps still run (e.g. the stop command), the job fails at its end
+                    job.error = job.error or f"{getattr(fn, '__name__', fn)}: {e}"
@@ -0,0 +1,161 @@
+"""Background confirmation of submitted payments.
+
+``BrewPay`` can return as soon as a transaction is sent. The signature is
+handed to ``PaymentConfirmer``, whose single thread polls the status of
+every pending signature with one ``getSignatureStatuses`` call per round,
+so any number of payments share one loop instead of each holding an MCP
+worker inside ``confirm_transaction``.
+"""
+
+import itertools
+import threading
+import time
+from typing import Optional, Union
+
+from solders.signature import Signature
+from solders.transaction_status import TransactionConfirmationStatus
+
+from brewie.metrics import metrics
+
+PENDING = "pending"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+EXPIRED = "expired"
+
+# getSignatureStatuses accepts up to 256 signatures per call
+MAX_STATUSES = 256
+
+
+class PaymentJob:
+    """One submitted transfer and its confirmation state."""
+
+    def __init__(self, job_id: int, signature, recipient: Union[str, list[str]], amount: float, last_valid_block_height: Optional[int] = None):
+        self.id = job_id
+        self.signature = signature
+        self.recipient = recipient
+        self.amount = amount
+        self.last_valid_block_height = last_valid_block_height
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.finished: Optional[float] = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _finish(self, state: str, error: Optional[str] = None):
+        self.state = state
+        self.error = error
+        self.finished = time.time()
+        self._done.set()
+
+    def status(self) -> dict:
+        status = {
+            "id": self.id,
+            "state": self.state,
+            "signature": str(self.signature),
+            "recipient": self.recipient,
+            "amount": self.amount,
+            "submitted": self.submitted,
+        }
+        if self.finished is not None:
+            status["seconds"] = round(self.finished - self.submitted, 3)
+        if self.error:
+            status["error"] = self.error
+        return status
+
+
+class PaymentConfirmer:
+    """Tracks pending signatures until confirmed, failed or expired.
+
+    ``rpc`` is a ``SolanaRPC``. Jobs without a last valid block height
+    expire after ``timeout`` seconds; the last ``keep`` finished jobs stay
+    queryable.
+    """
+
+    def __init__(self, rpc, commitment: str = "confirmed", poll: float = 0.5, timeout: float = 90.0, keep: int = 100):
+        self.rpc = rpc
+        self.commitment = TransactionConfirmationStatus.Finalized if commitment == "finalized" else TransactionConfirmationStatus.Confirmed
+        self.poll = poll
+        self.timeout = timeout
+        self.keep = keep
+        self._ids = itertools.count(1)
+        self._jobs: dict[int, PaymentJob] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, signature, recipient: Union[str, list[str]], amount: float, last_valid_block_height: Optional[int] = None) -> PaymentJob:
+        with self._cond:
+            job = PaymentJob(next(self._ids), signature, recipient, amount, last_valid_block_height)
+            self._jobs[job.id] = job
+            finished = [j.id for j in self._jobs.values() if j.done]
+            for old in finished[: max(0, len(finished) - self.keep)]:
+                del self._jobs[old]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="payment-confirmer", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        metrics.incr("payments.submitted")
+        return job
+
+    def get(self, job_id: int) -> Optional[PaymentJob]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[PaymentJob]:
+        with self._cond:
+            return list(self._jobs.values())
+
+    def pending(self) -> list[PaymentJob]:
+        with self._cond:
+            return [job for job in self._jobs.values() if not job.done]
+
+    def _finish(self, job: PaymentJob, state: str, error: Optional[str] = None):
+        job._finish(state, error)
+        metrics.incr(f"payments.{state}")
+        if state == CONFIRMED:
+            metrics.observe("solana.confirm", job.finished - job.submitted)
+        print(f"[Payments] Job {job.id} {state}{': ' + error if error else ''}")
+
+    def _check(self, jobs: list[PaymentJob]):
+        client = self.rpc.client
+        for start in range(0, len(jobs), MAX_STATUSES):
+            batch = jobs[start : start + MAX_STATUSES]
+            signatures = [job.signature if isinstance(job.signature, Signature) else Signature.from_string(str(job.signature)) for job in batch]
+            statuses = client.get_signature_statuses(signatures).value
+            for job, status in zip(batch, statuses):
+                if status is None:
+                    continue
+                if status.err is not None:
+                    self._finish(job, FAILED, str(status.err))
+                elif status.confirmation_status is not None and int(status.confirmation_status) >= int(self.commitment):
+                    self._finish(job, CONFIRMED)
+
+        waiting = [job for job in jobs if not job.done]
+        if not waiting:
+            return
+        height = None
+        if any(job.last_valid_block_height is not None for job in waiting):
+            height = client.get_block_height().value
+        now = time.time()
+        for job in waiting:
+            if job.last_valid_block_height is not None and height > job.last_valid_block_height:
+                self._finish(job, EXPIRED, "block height exceeded")
+            elif now - job.submitted > self.timeout:
+                self._finish(job, EXPIRED, "not confirmed in time")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not any(not job.done for job in self._jobs.values()):
+                    self._cond.wait()
+            try:
+                self._check(self.pending())
+            except Exception as e:
+                print(f"[Payments] Status check failed: {e}")
+            time.sleep(self.poll)
@@ -0,0 +1,39 @@
+"""Packing many SOL transfers into as few transactions as possible."""
+
+from solders.hash import Hash
+from solders.message import Message
+from solders.pubkey import Pubkey
+from solders.system_program import TransferParams, transfer
+from solders.transaction import Transaction
+
+# Largest serialized transaction the network accepts (IPv6 MTU minus headers)
+MAX_TRANSACTION_SIZE = 1232
+
+
+def transaction_size(message: Message) -> int:
+    """Serialized size of ``message`` signed by its required signers."""
+    return len(bytes(Transaction.new_unsigned(message)))
+
+
+def pack_transfers(payer: Pubkey, transfers: list[tuple[Pubkey, int]], blockhash: Hash, max_size: int = MAX_TRANSACTION_SIZE) -> list[Message]:
+    """Groups (recipient, lamports) transfers into messages under ``max_size``.
+
+    Transfers keep their order; each message holds as many transfer
+    instructions as fit (about 20 for distinct recipients).
+    """
+    messages = []
+    batch: list = []
+    packed = None
+    for recipient, lamports in transfers:
+        instruction = transfer(TransferParams(from_pubkey=payer, to_pubkey=recipient, lamports=lamports))
+        candidate = Message.new_with_blockhash(batch + [instruction], payer, blockhash)
+        if batch and transaction_size(candidate) > max_size:
+            messages.append(packed)
+            batch = [instruction]
+            packed = Message.new_with_blockhash(batch, payer, blockhash)
+        else:
+            batch.append(instruction)
+            packed = candidate
+    if batch:
+        messages.append(packed)
+    return messages
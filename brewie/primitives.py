@@ -0,0 +1,145 @@
+"""Declarative motion primitives compiled into prepared rosbridge messages.
+
+Sequences such as "aim, fire, re-center" are declared once in a JSON file
+(``motions.json``): the topics they use, named messages, and per primitive
+the resources it moves, its parameters (default, min, max) and timed steps.
+At startup every step is serialized into the rosbridge publish op it sends;
+"$name" values are parameters, and the JSON is split around them so a call
+only joins the fixed parts with the encoded parameter values. Tools ask for
+a primitive by name with overrides and get a ``Timeline`` back.
+"""
+
+import json
+import re
+from typing import Any, Optional
+
+from brewie.motion import Timeline
+
+_PARAM = re.compile(r"^\$(\w+)$")
+# json.dumps escapes the marker characters, the split pattern matches that
+_MARK = "\x00"
+_MARKED = re.compile(r'"\\u0000(\w+)\\u0000"')
+
+
+class MessageTemplate:
+    """One publish op for ``topic``, serialized once."""
+
+    def __init__(self, topic: str, message: dict):
+        self.message = message
+        marked = self._mark(message)
+        text = json.dumps({"op": "publish", "topic": topic, "msg": marked}, separators=(",", ":"))
+        pieces = _MARKED.split(text)
+        # Fixed JSON fragments alternate with parameter names
+        self.parts = [piece.encode("utf-8") for piece in pieces[0::2]]
+        self.params = pieces[1::2]
+
+    def _mark(self, value):
+        if isinstance(value, dict):
+            return {key: self._mark(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._mark(item) for item in value]
+        if isinstance(value, str) and (match := _PARAM.match(value)):
+            return f"{_MARK}{match.group(1)}{_MARK}"
+        return value
+
+    def render(self, values: dict) -> bytes:
+        if not self.params:
+            return self.parts[0]
+        out = [self.parts[0]]
+        for name, part in zip(self.params, self.parts[1:]):
+            out.append(json.dumps(values[name]).encode("utf-8"))
+            out.append(part)
+        return b"".join(out)
+
+    def fill(self, values: dict) -> dict:
+        """The message as a dict with parameters filled in."""
+        if not self.params:
+            return self.message
+        return self._fill(self.message, values)
+
+    def _fill(self, value, values: dict):
+        if isinstance(value, dict):
+            return {key: self._fill(item, values) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._fill(item, values) for item in value]
+        if isinstance(value, str) and (match := _PARAM.match(value)):
+            return values[match.group(1)]
+        return value
+
+
+class Primitive:
+    """A named, timed sequence of prepared messages."""
+
+    def __init__(self, name: str, resources, params: dict, steps: list, length: float):
+        self.name = name
+        self.resources = frozenset(resources)
+        self.params = params
+        # (offset, topic, template)
+        self.steps = steps
+        self.length = length
+
+    def values(self, overrides: dict) -> dict:
+        unknown = set(overrides) - set(self.params)
+        if unknown:
+            raise ValueError(f"Unknown parameters for {self.name}: {', '.join(sorted(unknown))}")
+        values = {}
+        for name, spec in self.params.items():
+            value = overrides.get(name, spec.get("default"))
+            if value is None:
+                raise ValueError(f"Missing parameter {name} for {self.name}")
+            if "min" in spec:
+                value = max(spec["min"], value)
+            if "max" in spec:
+                value = min(spec["max"], value)
+            values[name] = value
+        return values
+
+    def timeline(self, **overrides) -> Timeline:
+        values = self.values(overrides)
+        timeline = Timeline(self.name, self.resources)
+        for offset, topic, template in self.steps:
+            timeline.at(offset, topic.publish_payload, template.render(values), template.fill(values))
+        return timeline.hold(self.length)
+
+
+class MotionLibrary:
+    """Primitives from a motions JSON file, publishing on ``pool`` topics."""
+
+    def __init__(self, pool, path: str):
+        self.path = path
+        with open(path, "r") as f:
+            spec = json.load(f)
+        topics = {
+            key: pool.get(topic["name"], topic["type"])
+            for key, topic in spec.get("topics", {}).items()
+        }
+        messages = spec.get("messages", {})
+        self.primitives: dict[str, Primitive] = {}
+        for name, primitive in spec.get("primitives", {}).items():
+            steps = []
+            for step in primitive["steps"]:
+                if step["topic"] not in topics:
+                    raise ValueError(f"Motion {name}: unknown topic {step['topic']}")
+                message = step["msg"]
+                if isinstance(message, str):
+                    if message not in messages:
+                        raise ValueError(f"Motion {name}: unknown message {message}")
+                    message = messages[message]
+                topic = topics[step["topic"]]
+                template = MessageTemplate(topic.name, message)
+                missing = set(template.params) - set(primitive.get("params", {}))
+                if missing:
+                    raise ValueError(f"Motion {name}: undeclared parameters {', '.join(sorted(missing))}")
+                steps.append((float(step.get("at", 0.0)), topic, template))
+            length = float(primitive.get("length", max((offset for offset, _, _ in steps), default=0.0)))
+            self.primitives[name] = Primitive(name, primitive.get("resources", ()), primitive.get("params", {}), steps, length)
+        print(f"[Motion] Loaded {len(self.primitives)} motion primitives from {path}")
+
+    def get(self, name: str) -> Optional[Primitive]:
+        return self.primitives.get(name)
+
+    def timeline(self, name: str, **overrides: Any) -> Timeline:
+        primitive = self.primitives.get(name)
+        if primitive is None:
+            raise KeyError(f"Unknown motion primitive {name}")
+        return primitive.timeline(**overrides)
@@ -0,0 +1,146 @@
+"""In-memory QR code detection on camera frames.
+
+Frames are scanned straight from the camera buffer: converted to grayscale
+once, then tried at several scales (early exit on the first hit) and,
+optionally, after adaptive thresholding, which helps with glare and uneven
+light on phone screens. ``QRScanner`` keeps taking fresh frames until a
+deadline, so one blurry frame no longer fails a payment.
+"""
+
+import time
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+from pyzbar import pyzbar
+
+
+def grayscale(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+
+
+def decode_qr(
+    image: np.ndarray,
+    scales: tuple = (1.0, 0.5, 2.0),
+    adaptive: bool = True,
+    accept: Optional[Callable[[str], bool]] = None,
+) -> tuple[list[str], Optional[dict]]:
+    """Decodes the QR codes in ``image``.
+
+    Scales are tried in order and the first pass that finds an accepted
+    code wins. Returns (codes, info) where info names the scale and whether
+    the thresholded image was used, or ([], None) when nothing was found.
+    ``accept`` filters decoded strings, e.g. to skip codes that are not
+    wallet addresses.
+    """
+    gray = grayscale(image)
+    for scale in scales:
+        if scale == 1.0:
+            scaled = gray
+        else:
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            scaled = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+        variants = [scaled]
+        if adaptive:
+            variants.append(
+                cv2.adaptiveThreshold(scaled, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 5)
+            )
+        for thresholded, variant in enumerate(variants):
+            codes = []
+            for symbol in pyzbar.decode(variant, symbols=[pyzbar.ZBarSymbol.QRCODE]):
+                data = symbol.data.decode("utf-8", errors="replace")
+                if data not in codes and (accept is None or accept(data)):
+                    codes.append(data)
+            if codes:
+                return codes, {"scale": scale, "threshold": bool(thresholded)}
+    return [], None
+
+
+class QRScanner:
+    """Scans successive fresh camera frames for QR codes until a deadline."""
+
+    def __init__(self, camera, scales: tuple = (1.0, 0.5, 2.0), adaptive: bool = True, timeout: float = 3.0):
+        self.camera = camera
+        self.scales = scales
+        self.adaptive = adaptive
+        self.timeout = timeout
+
+    def scan(
+        self,
+        first=None,
+        after: Optional[float] = None,
+        timeout: Optional[float] = None,
+        accept: Optional[Callable[[str], bool]] = None,
+    ) -> tuple[list[str], dict]:
+        """Returns (codes, report).
+
+        Starts with ``first`` (a frame already captured) when given, then
+        waits for frames stamped after the previous one. The report holds
+        the number of frames tried, the seq/scale/threshold that succeeded
+        and the elapsed time; codes is empty when the deadline passed.
+        """
+        start = time.monotonic()
+        deadline = start + (self.timeout if timeout is None else timeout)
+        frame = first
+        report = {"frames": 0, "seq": None, "scale": None, "threshold": None, "elapsed": 0.0}
+        while True:
+            if frame is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                frame = self.camera.wait_for_frame(after=after, timeout=remaining)
+                if frame is None:
+                    break
+            report["frames"] += 1
+            image = frame.decode()
+            if image is not None:
+                codes, info = decode_qr(image, self.scales, self.adaptive, accept)
+                if codes:
+                    report.update(info, seq=frame.seq, elapsed=time.monotonic() - start)
+                    return codes, report
+            after = frame.stamp
+            frame = None
+            if time.monotonic() >= deadline:
+                break
+        report["elapsed"] = time.monotonic() - start
+        return [], report
+
+    def collect(
+        self,
+        first=None,
+        after: Optional[float] = None,
+        timeout: Optional[float] = None,
+        accept: Optional[Callable[[str], bool]] = None,
+        limit: int = 0,
+    ) -> tuple[list[str], dict]:
+        """Gathers distinct codes from successive frames.
+
+        Several codes in one frame and codes shown one after another are
+        both collected, in the order first seen. Stops once ``limit`` codes
+        (0 = no limit) are found or the deadline passes. The report holds
+        the number of frames tried and the elapsed time.
+        """
+        start = time.monotonic()
+        deadline = start + (self.timeout if timeout is None else timeout)
+        frame = first
+        codes: list[str] = []
+        report = {"frames": 0, "elapsed": 0.0}
+        while not limit or len(codes) < limit:
+            if frame is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                frame = self.camera.wait_for_frame(after=after, timeout=remaining)
+                if frame is None:
+                    break
+            report["frames"] += 1
+            image = frame.decode()
+            if image is not None:
+                found, _ = decode_qr(image, self.scales, self.adaptive, accept)
+                codes.extend(code for code in found if code not in codes)
+            after = frame.stamp
+            frame = None
+        report["elapsed"] = time.monotonic() - start
+        return codes[:limit] if limit else codes, report
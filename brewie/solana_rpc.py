@@ -0,0 +1,182 @@
+"""Long-lived Solana RPC client with a background blockhash cache.
+
+One ``solana.rpc.api.Client`` (and its keep-alive HTTP session) is reused
+for every payment. ``prefetch()`` warms the connection and fetches a
+blockhash on a background thread, so BrewPay can start it while the head
+is still tilting and the QR code is being decoded. While the client is in
+use the blockhash keeps being refreshed, which also stops the pooled
+connection from idling out.
+
+Stage timings go to ``brewie.metrics`` as ``solana.connect``,
+``solana.blockhash``, ``solana.send`` and ``solana.confirm``.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from solana.rpc.api import Client
+from solana.rpc.types import TxOpts
+from solders.hash import Hash
+
+from brewie.metrics import metrics
+
+
+class SolanaRPC:
+    """Shared RPC client for ``endpoint``.
+
+    A blockhash is valid for about 150 slots (~60 s); cached hashes are
+    reused for ``blockhash_ttl`` seconds. After ``prefetch()`` or a use,
+    the background thread refreshes the hash every ``refresh_interval``
+    seconds for ``keep_warm`` seconds, then goes idle.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        commitment: str = "confirmed",
+        timeout: float = 10.0,
+        blockhash_ttl: float = 30.0,
+        refresh_interval: float = 4.0,
+        keep_warm: float = 60.0,
+        confirm_poll: float = 0.25,
+    ):
+        self.endpoint = endpoint
+        self.commitment = commitment
+        self.timeout = timeout
+        self.blockhash_ttl = blockhash_ttl
+        self.refresh_interval = refresh_interval
+        self.keep_warm = keep_warm
+        self.confirm_poll = confirm_poll
+        self._client: Optional[Client] = None
+        self._connected = False
+        self._blockhash: Optional[tuple[Hash, int, float]] = None
+        self._sent: dict[str, float] = {}
+        self._fetching = False
+        self._warm_until = 0.0
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def client(self) -> Client:
+        if self._client is None:
+            self._client = Client(self.endpoint, commitment=self.commitment, timeout=self.timeout)
+        return self._client
+
+    def _age(self) -> float:
+        if self._blockhash is None:
+            return float("inf")
+        return time.monotonic() - self._blockhash[2]
+
+    def _warm(self):
+        self._warm_until = time.monotonic() + self.keep_warm
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="solana-rpc", daemon=True)
+            self._thread.start()
+
+    def _fetch(self):
+        with self._cond:
+            if self._fetching:
+                # Another thread is already fetching; use its result
+                self._cond.wait_for(lambda: not self._fetching, timeout=self.timeout)
+                if self._age() < self.blockhash_ttl:
+                    return
+            self._fetching = True
+        try:
+            if not self._connected:
+                with metrics.timer("solana.connect"):
+                    self._connected = self.client.is_connected()
+            with metrics.timer("solana.blockhash"):
+                value = self.client.get_latest_blockhash(self.commitment).value
+            with self._cond:
+                self._blockhash = (value.blockhash, value.last_valid_block_height, time.monotonic())
+        except Exception:
+            self._connected = False
+            raise
+        finally:
+            with self._cond:
+                self._fetching = False
+                self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            idle = time.monotonic() > self._warm_until
+            self._wake.wait(None if idle else self.refresh_interval)
+            self._wake.clear()
+            if time.monotonic() > self._warm_until or self._age() < self.refresh_interval:
+                continue
+            try:
+                self._fetch()
+            except Exception as e:
+                print(f"[Solana] Blockhash refresh failed: {e}")
+
+    def prefetch(self):
+        """Connects and fetches a blockhash in the background."""
+        self._warm()
+        self._wake.set()
+
+    def invalidate(self):
+        """Drops the cached blockhash, e.g. after "Blockhash not found"."""
+        with self._cond:
+            self._blockhash = None
+
+    def blockhash(self, fresh: bool = False) -> tuple[Hash, int]:
+        """Returns (blockhash, last valid block height).
+
+        Uses the cached hash when it is younger than the TTL (unless
+        ``fresh``), waits for a fetch already in flight, and fetches
+        synchronously otherwise.
+        """
+        self._warm()
+        with self._cond:
+            self._cond.wait_for(lambda: not self._fetching, timeout=self.timeout)
+            if fresh:
+                self._blockhash = None
+            if self._age() < self.blockhash_ttl:
+                metrics.incr("solana.blockhash_cache.hits")
+                return self._blockhash[0], self._blockhash[1]
+        metrics.incr("solana.blockhash_cache.misses")
+        self._fetch()
+        with self._cond:
+            if self._blockhash is None:
+                raise RuntimeError("Failed to get latest block hash")
+            return self._blockhash[0], self._blockhash[1]
+
+    def was_sent(self, signature) -> bool:
+        """Whether ``signature`` was sent while its blockhash could be valid.
+
+        Identical transfers signed with the same cached blockhash have the
+        same signature and the network would drop the repeat.
+        """
+        now = time.monotonic()
+        with self._cond:
+            for key in [key for key, sent in self._sent.items() if now - sent > 2 * self.blockhash_ttl]:
+                del self._sent[key]
+            return str(signature) in self._sent
+
+    def send(self, transaction):
+        """Sends a signed transaction and returns its signature."""
+        with metrics.timer("solana.send"):
+            result = self.client.send_transaction(
+                transaction,
+                opts=TxOpts(skip_preflight=False, preflight_commitment=self.commitment),
+            )
+        if result.value is not None:
+            with self._cond:
+                self._sent[str(result.value)] = time.monotonic()
+        return result.value
+
+    def confirm(self, signature, last_valid_block_height: Optional[int] = None):
+        """Blocks until ``signature`` reaches the commitment level.
+
+        Returns the confirmation status of the signature.
+        """
+        with metrics.timer("solana.confirm"):
+            confirmation = self.client.confirm_transaction(
+                signature,
+                commitment=self.commitment,
+                sleep_seconds=self.confirm_poll,
+                last_valid_block_height=last_valid_block_height,
+            )
+        return confirmation.value[0].confirmation_status
@@ -0,0 +1,426 @@
+"""Background persistence of camera captures.
+
+Encoding a PNG and writing it to disk used to happen inside the MCP tool
+call. ``ImageWriter`` moves that work onto a small pool of writer threads
+behind a bounded queue, so a capture returns as soon as the frame is in
+memory. Callers that need the file on disk wait on the returned job or call
+``flush``.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from .imaging import frame_codec
+
+FORMATS = ("png", "jpeg", "original")
+DROP_POLICIES = ("block", "drop_newest", "drop_oldest")
+# Capture files are named by id: image_<id>.<ext>
+CAPTURE_FILE = re.compile(r"image_(\d+)\.")
+
+
+class WriteJob:
+    """Handle for one queued write."""
+
+    __slots__ = ("path", "frame", "image", "submitted", "written", "error", "dropped", "_done")
+
+    def __init__(self, path: str, frame=None, image: Optional[np.ndarray] = None):
+        self.path = path
+        self.frame = frame
+        self.image = image
+        self.submitted = time.monotonic()
+        self.written = None
+        self.error = None
+        self.dropped = False
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def ok(self) -> bool:
+        return self.done and self.error is None and not self.dropped
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the file is written (or the job failed/was dropped)."""
+        return self._done.wait(timeout) and self.ok
+
+    def _finish(self, error: Optional[str] = None, dropped: bool = False):
+        self.error = error
+        self.dropped = dropped
+        self.written = time.monotonic()
+        # Release pixels and payload as soon as they are on disk
+        self.frame = self.image = None
+        self._done.set()
+
+
+class ImageWriter:
+    """Bounded, multi-threaded writer for camera captures.
+
+    ``fmt`` selects what lands on disk: ``"png"`` (``png_level`` 0-9),
+    ``"jpeg"`` (``jpeg_quality`` 0-100) or ``"original"``, which writes the
+    compressed camera bytes untouched and never decodes the frame. When the
+    queue is full ``policy`` decides: ``"block"`` waits up to
+    ``block_timeout`` for room, ``"drop_newest"`` rejects the new capture and
+    ``"drop_oldest"`` discards the oldest queued one. ``on_written`` is
+    called with the path and size of every file written.
+    """
+
+    def __init__(
+        self,
+        fmt: str = "png",
+        jpeg_quality: int = 90,
+        png_level: int = 1,
+        workers: int = 2,
+        max_queue: int = 16,
+        policy: str = "block",
+        block_timeout: float = 2.0,
+        on_written: Optional[Callable[[str, int], None]] = None,
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported image format: {fmt}")
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unsupported drop policy: {policy}")
+        self.fmt = fmt
+        self.jpeg_quality = jpeg_quality
+        self.png_level = png_level
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.max_queue = max_queue
+        self.on_written = on_written
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.write_seconds = 0.0
+
+        self._queue: deque[WriteJob] = deque()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"image-writer-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def extension(self, frame=None) -> str:
+        if self.fmt == "png":
+            return ".png"
+        if self.fmt == "jpeg":
+            return ".jpg"
+        if frame is None:
+            return ".jpg"
+        # Raw frames have no compressed bytes to keep and are saved as PNG
+        return ".jpg" if frame_codec(frame) == "jpeg" else ".png"
+
+    def submit(self, path: str, frame=None, image: Optional[np.ndarray] = None) -> WriteJob:
+        """Queues a capture for writing and returns immediately.
+
+        ``frame`` is a ``brewie.camera.Frame``; ``image`` may be passed when
+        the pixels are already decoded so the writer does not decode again.
+        """
+        job = WriteJob(path, frame, image)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ImageWriter is closed")
+            if len(self._queue) >= self.max_queue:
+                if self.policy == "drop_newest":
+                    self.dropped += 1
+                    job._finish(dropped=True)
+                    print(f"[Writer] Queue full, dropped {path}")
+                    return job
+                if self.policy == "drop_oldest":
+                    oldest = self._queue.popleft()
+                    self.dropped += 1
+                    oldest._finish(dropped=True)
+                    print(f"[Writer] Queue full, dropped {oldest.path}")
+                else:
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._queue) >= self.max_queue:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.dropped += 1
+                            job._finish(dropped=True)
+                            print(f"[Writer] Queue still full after {self.block_timeout}s, dropped {path}")
+                            return job
+                        self._cond.wait(remaining)
+            self._queue.append(job)
+            self._cond.notify_all()
+        return job
+
+    def pending(self) -> int:
+        """Number of captures queued or being written."""
+        with self._cond:
+            return len(self._queue) + self._in_flight
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until everything submitted so far is on disk."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "format": self.fmt,
+                "policy": self.policy,
+                "queued": len(self._queue),
+                "in_flight": self._in_flight,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "bytes_written": self.bytes_written,
+                "avg_write_ms": round(1000 * self.write_seconds / self.written, 2) if self.written else None,
+            }
+
+    def close(self, timeout: Optional[float] = None):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                job = self._queue.popleft()
+                self._in_flight += 1
+                # Wake submitters blocked on a full queue
+                self._cond.notify_all()
+
+            started = time.perf_counter()
+            error = None
+            size = 0
+            try:
+                size = self._write(job)
+            except Exception as e:
+                error = str(e)
+                print(f"[Writer] Failed to write {job.path}: {e}")
+            elapsed = time.perf_counter() - started
+
+            with self._cond:
+                self._in_flight -= 1
+                if error is None:
+                    self.written += 1
+                    self.bytes_written += size
+                    self.write_seconds += elapsed
+                else:
+                    self.failed += 1
+                job._finish(error)
+                self._cond.notify_all()
+
+            if error is None and self.on_written is not None:
+                try:
+                    self.on_written(job.path, size)
+                except Exception as e:
+                    print(f"[Writer] on_written hook failed for {job.path}: {e}")
+
+    def _write(self, job: WriteJob) -> int:
+        os.makedirs(os.path.dirname(job.path) or ".", exist_ok=True)
+        frame = job.frame
+        if self.fmt == "original" and frame is not None and frame.is_compressed:
+            data = frame.data
+        else:
+            image = job.image if job.image is not None else frame.decode()
+            if image is None:
+                raise ValueError("frame could not be decoded")
+            if self.fmt == "jpeg":
+                ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            else:
+                ok, encoded = cv2.imencode(".png", image, [cv2.IMWRITE_PNG_COMPRESSION, self.png_level])
+            if not ok:
+                raise ValueError("image encoding failed")
+            data = encoded.data
+
+        # Write to a temp name first so readers never see a partial file
+        tmp_path = job.path + ".part"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, job.path)
+        return memoryview(data).nbytes
+
+
+class CaptureIndex:
+    """In-process index of saved captures backed by an append-only manifest.
+
+    Every capture gets the next id of a monotonic counter, which also names
+    its file, so no directory listing is needed and concurrent captures
+    never collide. The manifest is a JSONL file of ``add``/``prune`` entries
+    that is replayed on startup, so ids keep increasing across restarts;
+    ids also start past any ``image_<n>`` file already in the directory.
+    Old files are pruned once more than ``max_files`` captures or
+    ``max_bytes`` bytes are kept (0 disables a limit).
+    """
+
+    def __init__(self, directory: str, manifest: str, max_files: int = 200, max_bytes: int = 0):
+        self.directory = directory
+        self.manifest = manifest
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.session = time.strftime("%Y%m%d-%H%M%S")
+        self.total_bytes = 0
+
+        self._records: dict[int, dict] = {}
+        self._by_path: dict[str, dict] = {}
+        self._order: deque[int] = deque()
+        self._session_ids: list[int] = []
+        # Pruned before the writer got to them; deleted once written
+        self._orphans: set[str] = set()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        os.makedirs(os.path.dirname(manifest) or ".", exist_ok=True)
+        self._load()
+        self._next_id = max(self._next_id, self._next_file_id())
+
+    def _next_file_id(self) -> int:
+        """One past the largest ``image_<n>`` id on disk, so no file is overwritten."""
+        ids = [int(match.group(1)) for match in map(CAPTURE_FILE.match, os.listdir(self.directory)) if match]
+        return max(ids) + 1 if ids else 0
+
+    def _load(self):
+        if not os.path.exists(self.manifest):
+            return
+        with open(self.manifest, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line after a crash
+                    continue
+                if entry.get("op") == "prune":
+                    record = self._records.pop(entry["id"], None)
+                    if record is not None:
+                        self._by_path.pop(record["path"], None)
+                        self.total_bytes -= record.get("bytes") or 0
+                    continue
+                if entry.get("op") == "size":
+                    record = self._records.get(entry["id"])
+                    if record is not None:
+                        self.total_bytes += entry["bytes"] - (record.get("bytes") or 0)
+                        record["bytes"] = entry["bytes"]
+                    continue
+                record = entry["record"]
+                self.total_bytes += record.get("bytes") or 0
+                self._records[record["id"]] = record
+                self._by_path[record["path"]] = record
+                self._next_id = max(self._next_id, record["id"] + 1)
+        self._order = deque(sorted(self._records))
+        # Rewrite the manifest without pruned entries
+        self._compact()
+
+    def _compact(self):
+        tmp_path = self.manifest + ".part"
+        with open(tmp_path, "w") as f:
+            for capture_id in self._order:
+                f.write(json.dumps({"op": "add", "record": self._records[capture_id]}) + "\n")
+        os.replace(tmp_path, self.manifest)
+
+    def _append(self, entries: list[dict]):
+        with open(self.manifest, "a") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+
+    def add(self, extension: str, stamp: Optional[float] = None, topic: Optional[str] = None, **meta) -> dict:
+        """Reserves the next id and path for a capture and records it."""
+        with self._lock:
+            capture_id = self._next_id
+            self._next_id += 1
+            record = {
+                "id": capture_id,
+                "session": self.session,
+                "captured": time.time(),
+                "stamp": stamp,
+                "topic": topic,
+                "path": os.path.join(self.directory, f"image_{capture_id}{extension}"),
+                "bytes": None,
+            }
+            record.update(meta)
+            self._records[capture_id] = record
+            self._by_path[record["path"]] = record
+            self._order.append(capture_id)
+            self._session_ids.append(capture_id)
+            self._append([{"op": "add", "record": record}])
+            return record
+
+    def get(self, capture_id: int) -> Optional[dict]:
+        with self._lock:
+            return self._records.get(capture_id)
+
+    def last(self, count: int = 1, session_only: bool = True) -> list[dict]:
+        """Most recent captures, newest last; ``count`` is at least 1."""
+        count = max(1, count)
+        with self._lock:
+            if session_only:
+                ids = self._session_ids[-count:]
+            else:
+                ids = [self._order[-i] for i in range(min(count, len(self._order)), 0, -1)]
+            return [self._records[i] for i in ids if i in self._records]
+
+    def on_written(self, path: str, size: int):
+        """Hook for ``ImageWriter``: records the size and applies retention."""
+        with self._lock:
+            record = self._by_path.get(path)
+            if record is None:
+                if path in self._orphans:
+                    self._orphans.discard(path)
+                    self._remove(path)
+                return
+            self.total_bytes += size - (record.get("bytes") or 0)
+            record["bytes"] = size
+            self._append([{"op": "size", "id": record["id"], "bytes": size}])
+            self._prune()
+
+    def _prune(self):
+        pruned = []
+        while self._order and (
+            (self.max_files and len(self._order) > self.max_files)
+            or (self.max_bytes and self.total_bytes > self.max_bytes)
+        ):
+            record = self._records.pop(self._order.popleft())
+            self._by_path.pop(record["path"], None)
+            if record.get("bytes") is None:
+                self._orphans.add(record["path"])
+            else:
+                self.total_bytes -= record["bytes"]
+                self._remove(record["path"])
+            pruned.append({"op": "prune", "id": record["id"]})
+        if pruned:
+            self._append(pruned)
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[Captures] Delete error {path}: {e}")
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "session": self.session,
+                "captures": len(self._order),
+                "session_captures": len(self._session_ids),
+                "bytes": self.total_bytes,
+                "next_id": self._next_id,
+            }
@@ -0,0 +1,112 @@
+"""Pipelined head sweeps for sniper.
+
+The head is moved through a list of pan/tilt positions and one fresh frame
+is taken at each. Decoding and encoding frame k runs on worker threads
+while the head is already moving to position k+1, so after the last
+capture only the last frame's encode is left before the VLM request.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+def parse_positions(text: str) -> list[tuple[float, Optional[float]]]:
+    """Parses "pan[:tilt],pan[:tilt],..." into (pan, tilt) pairs.
+
+    A missing tilt means the tilt is left where it is.
+    """
+    positions = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        pan, _, tilt = item.partition(":")
+        positions.append((float(pan), float(tilt) if tilt.strip() else None))
+    if not positions:
+        raise ValueError("Sweep needs at least one position")
+    return positions
+
+
+def even_positions(count: int, left: float = 1.2, right: float = -1.2, tilt: Optional[float] = None) -> list[tuple[float, Optional[float]]]:
+    """``count`` pan positions spread evenly from ``left`` to ``right``."""
+    if count < 1:
+        raise ValueError("Sweep needs at least one position")
+    if count == 1:
+        return [(0.0, tilt)]
+    step = (right - left) / (count - 1)
+    return [(round(left + i * step, 3), tilt) for i in range(count)]
+
+
+class SweepEngine:
+    """Runs a sweep with capture and encoding overlapped with head motion.
+
+    ``move(position)`` sends the head command and returns the time it was
+    sent, ``wait_frame(command_time, position)`` returns the first frame
+    taken after the head settled (or None), ``encode(frame)`` runs on a
+    worker thread and ``on_frame(frame, position)`` (optional) is called
+    on the sweep thread right after each capture.
+    """
+
+    def __init__(
+        self,
+        move: Callable,
+        wait_frame: Callable,
+        encode: Callable,
+        on_frame: Optional[Callable] = None,
+        workers: int = 2,
+    ):
+        self.move = move
+        self.wait_frame = wait_frame
+        self.encode = encode
+        self.on_frame = on_frame
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sweep-encode")
+
+    def _timed_encode(self, frame):
+        start = time.perf_counter()
+        result = self.encode(frame)
+        return result, time.perf_counter() - start
+
+    def run(self, positions: list) -> dict:
+        """Sweeps ``positions`` and returns frames, encoded payloads and timings.
+
+        Timings are in seconds: per position the move+settle wait for a
+        fresh frame and the encode time on the worker, plus the tail spent
+        waiting for encodes after the last capture and the total.
+        """
+        started = time.perf_counter()
+        frames = []
+        futures = []
+        frame_waits = []
+        try:
+            for position in positions:
+                step = time.perf_counter()
+                command_time = self.move(position)
+                frame = self.wait_frame(command_time, position)
+                frame_waits.append(time.perf_counter() - step)
+                if frame is None:
+                    raise TimeoutError(f"No fresh frame at position {position}")
+                frames.append(frame)
+                if self.on_frame is not None:
+                    self.on_frame(frame, position)
+                futures.append(self._pool.submit(self._timed_encode, frame))
+
+            captured = time.perf_counter()
+            results = [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        finished = time.perf_counter()
+
+        return {
+            "frames": frames,
+            "payloads": [payload for payload, _ in results],
+            "timings": {
+                "frame_wait": frame_waits,
+                "encode": [seconds for _, seconds in results],
+                "capture_total": captured - started,
+                "encode_tail": finished - captured,
+                "total": finished - started,
+            },
+        }
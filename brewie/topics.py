@@ -0,0 +1,108 @@
+"""Publisher topics shared by every tool on one rosbridge connection.
+
+Creating a ``roslibpy.Topic`` per call and unadvertising it afterwards makes
+rosbridge set up a new ROS publisher each time, and the first messages on it
+can be lost while subscribers reconnect. ``TopicPool`` hands out one topic
+per (name, type), advertises it on first publish and keeps it advertised.
+After the connection drops, each topic is advertised again on its next
+publish.
+"""
+
+import threading
+import time
+
+import roslibpy
+
+from brewie.metrics import metrics
+
+
+class PooledTopic(roslibpy.Topic):
+    """A publisher topic that counts publishes and times its advertise."""
+
+    def __init__(self, ros, name, message_type, **options):
+        # roslibpy resets the advertise id when the connection closes, so the
+        # next publish advertises again on the new connection
+        super().__init__(ros, name, message_type, reconnect_on_close=False, **options)
+        self.published = 0
+        self.advertises = 0
+        self.advertise_seconds = None
+        # Last published message, e.g. the commanded head position
+        self.last = None
+
+    def advertise(self):
+        if self.is_advertised:
+            return
+        start = time.monotonic()
+        super().advertise()
+        self.advertises += 1
+        metrics.incr("ros.advertise")
+
+        def sent(_proto):
+            self.advertise_seconds = time.monotonic() - start
+            metrics.observe("ros.advertise", self.advertise_seconds)
+
+        # Runs once the advertise above has been handed to the connection
+        self.ros.factory.on_ready(sent)
+
+    def publish(self, message):
+        super().publish(message)
+        self.last = message
+        self.published += 1
+        metrics.incr("ros.publish")
+
+    def publish_payload(self, payload: bytes, message):
+        """Publishes an already serialized publish op for ``message``.
+
+        Used by prepared motion primitives (``brewie.primitives``), which
+        skip building and encoding the message on every call.
+        """
+        if not self.is_advertised:
+            self.advertise()
+        self.ros.factory.on_ready(lambda proto: proto.send_message(payload))
+        self.last = message
+        self.published += 1
+        metrics.incr("ros.publish")
+
+    def status(self) -> dict:
+        return {
+            "type": self.message_type,
+            "advertised": self.is_advertised,
+            "advertises": self.advertises,
+            "advertise_ms": None if self.advertise_seconds is None else round(self.advertise_seconds * 1000, 2),
+            "published": self.published,
+        }
+
+
+class TopicPool:
+    """One ``PooledTopic`` per (name, type) on ``ros``."""
+
+    def __init__(self, ros: roslibpy.Ros):
+        self.ros = ros
+        self._topics: dict[tuple[str, str], PooledTopic] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, message_type: str, **options) -> PooledTopic:
+        """Returns the shared topic; ``options`` only apply when it is created."""
+        key = (name, message_type)
+        with self._lock:
+            topic = self._topics.get(key)
+            if topic is None:
+                topic = self._topics[key] = PooledTopic(self.ros, name, message_type, **options)
+            return topic
+
+    def publish(self, name: str, message_type: str, message) -> PooledTopic:
+        topic = self.get(name, message_type)
+        topic.publish(message)
+        return topic
+
+    def status(self) -> dict:
+        with self._lock:
+            topics = list(self._topics.values())
+        return {topic.name: topic.status() for topic in topics}
+
+    def close(self):
+        """Unadvertises every topic, e.g. before the connection is closed."""
+        with self._lock:
+            topics = list(self._topics.values())
+        for topic in topics:
+            topic.unadvertise()
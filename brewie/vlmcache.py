@@ -0,0 +1,91 @@
+"""Cache of VLM target selections keyed by perceptual hashes of sweep frames.
+
+When the robot stands still, consecutive sniper sweeps see almost the same
+frames. Each frame gets a 64-bit DCT perceptual hash; a later sweep for the
+same target whose frames are all within a Hamming distance of a cached
+sweep reuses its answer instead of calling the VLM again.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+def phash(image: np.ndarray) -> int:
+    """64-bit DCT perceptual hash of an image."""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    # The DC term only reflects overall brightness
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def normalize_target(target: str) -> str:
+    """Lowercases and strips punctuation so "Purple ball!" == "purple  ball"."""
+    return " ".join(re.sub(r"[^\w\s]", " ", target.lower()).split())
+
+
+class TargetCache:
+    """LRU + TTL cache of (source, target, positions, frame hashes) -> photo index.
+
+    A lookup hits when the source (the robot or camera the frames came
+    from), the normalized target and the sweep positions match and every
+    frame hash is within ``max_distance`` bits of a cached sweep.
+    ``max_entries=0`` disables the cache.
+    """
+
+    def __init__(self, max_entries: int = 64, ttl: float = 30.0, max_distance: int = 8):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._entries: OrderedDict[tuple, tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        for key in [key for key, (_, stored) in self._entries.items() if now - stored > self.ttl]:
+            del self._entries[key]
+
+    def get(self, target: str, positions, hashes: list[int], source: str = "") -> Optional[int]:
+        if not self.max_entries:
+            return None
+        target = normalize_target(target)
+        positions = tuple(positions)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            for key, (index, _) in reversed(self._entries.items()):
+                cached_source, cached_target, cached_positions, cached_hashes = key
+                if cached_source != source or cached_target != target or cached_positions != positions:
+                    continue
+                if all(hamming(a, b) <= self.max_distance for a, b in zip(cached_hashes, hashes)):
+                    self._entries.move_to_end(key)
+                    return index
+        return None
+
+    def put(self, target: str, positions, hashes: list[int], index: int, source: str = ""):
+        if not self.max_entries:
+            return
+        key = (source, normalize_target(target), tuple(positions), tuple(hashes))
+        with self._lock:
+            self._entries[key] = (index, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,159 @@
+"""Walking by streaming joystick axes instead of a move-and-stop pulse.
+
+A single Joy message followed by an all-zero one makes the robot walk for
+however long rosbridge takes between the two. ``WalkStream`` holds the
+commanded axes and republishes them at a fixed rate for a requested time,
+like a latch repeater for ``cmd_vel``, then sends the idle message. A new
+command while walking changes the axes and the remaining time of the same
+walk. The walk only goes on while its client is heard from: a command or a
+``keepalive`` at least every ``deadman`` seconds, otherwise it stops as if
+the client had gone away. When the rosbridge connection is down nothing is
+published (roslibpy would queue the stale commands and flush them on
+reconnect); after ``deadman`` seconds offline the walk is abandoned and the
+idle message is left queued so it is the first thing the robot gets back.
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+from brewie.metrics import metrics
+
+AXES = 8
+BUTTONS = 15
+
+
+def joy_message(x: float, z: float) -> dict:
+    return {'axes': [x, z] + [0.0] * (AXES - 2), 'buttons': [0] * BUTTONS}
+
+
+class WalkStream:
+    """Streams ``(x, z)`` on the Joy ``topic`` as a motion job on ``scheduler``.
+
+    The walk holds the "legs" resource, so it waits for running leg motions
+    (defend fires through the joystick too) and they wait for it.
+    """
+
+    def __init__(
+        self,
+        topic,
+        scheduler,
+        connected: Callable[[], bool],
+        rate: float = 10.0,
+        deadman: float = 1.0,
+        max_seconds: float = 30.0,
+    ):
+        self.topic = topic
+        self.scheduler = scheduler
+        self.connected = connected
+        self.rate = rate
+        self.deadman = deadman
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self._job = None
+        self._axes = (0.0, 0.0)
+        self._seconds = 0.0
+        # Monotonic end of the running walk, None while it is queued
+        self._end: Optional[float] = None
+        # Monotonic time of the last command or keepalive
+        self._heard = time.monotonic()
+        self._updates = 0
+
+    @property
+    def active(self) -> bool:
+        with self._lock:
+            return self._job is not None
+
+    def drive(self, x: float, z: float, seconds: float):
+        """Walks with axes ``x``, ``z`` for ``seconds`` from now.
+
+        Returns ``(job, updated)``; ``updated`` is True when the command
+        changed a walk that was already queued or running.
+        """
+        x = max(-1.0, min(1.0, float(x)))
+        z = max(-1.0, min(1.0, float(z)))
+        seconds = max(0.0, min(self.max_seconds, seconds))
+        with self._lock:
+            self._axes = (x, z)
+            self._seconds = seconds
+            self._heard = time.monotonic()
+            if self._job is not None:
+                if self._end is not None:
+                    self._end = time.monotonic() + seconds
+                self._updates += 1
+                metrics.incr("walk.updates")
+                return self._job, True
+            self._end = None
+            self._updates = 0
+            self._job = self.scheduler.run("walk", ("legs",), self._stream)
+            return self._job, False
+
+    def keepalive(self) -> bool:
+        """Tells the walk its client is still there; False when not walking."""
+        with self._lock:
+            self._heard = time.monotonic()
+            return self._job is not None
+
+    def stop(self) -> bool:
+        """Ends the current walk at the next tick; False when not walking."""
+        with self._lock:
+            if self._job is None:
+                return False
+            self._axes = (0.0, 0.0)
+            self._seconds = 0.0
+            if self._end is not None:
+                self._end = time.monotonic()
+            return True
+
+    def _stream(self) -> dict:
+        period = 1.0 / self.rate
+        with self._lock:
+            start = time.monotonic()
+            self._end = start + self._seconds
+            # Time spent queued behind other leg motions does not count
+            self._heard = start
+        tick = start
+        sent = 0
+        offline_since = None
+        reason = "done"
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    if now >= self._end:
+                        break
+                    axes, end, heard = self._axes, self._end, self._heard
+                if now - heard >= self.deadman:
+                    reason = "stalled"
+                    metrics.incr("walk.deadman")
+                    print(f"[Walk] No command for {self.deadman:g}s, stopping")
+                    break
+                if self.connected():
+                    offline_since = None
+                    self.topic.publish(joy_message(*axes))
+                    sent += 1
+                else:
+                    if offline_since is None:
+                        offline_since = now
+                    if now - offline_since >= self.deadman:
+                        reason = "deadman"
+                        metrics.incr("walk.deadman")
+                        print(f"[Walk] No rosbridge connection for {self.deadman:g}s, stopping")
+                        break
+                tick += period
+                time.sleep(max(0.0, min(tick, end) - time.monotonic()))
+        finally:
+            with self._lock:
+                # A command from here on starts a new walk, which queues
+                # behind this job until the idle message is out
+                self._job = None
+                self._end = None
+                updates = self._updates
+            self.topic.publish(joy_message(0.0, 0.0))
+        metrics.incr("walk.messages", sent)
+        return {
+            "seconds": round(time.monotonic() - start, 3),
+            "messages": sent,
+            "updates": updates,
+            "reason": reason,
+        }
@@ -0,0 +1,80 @@
+"""Resident payer keypair and cached address validation.
+
+The keypair file is read and base58-decoded once. Later loads only stat
+the file (at most every ``check_interval`` seconds) and reload it when its
+mtime changes, so repeated payments skip file reads and key decoding.
+"""
+
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Optional
+
+import base58
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+
+from brewie.metrics import metrics
+
+
+@lru_cache(maxsize=4096)
+def validate_address(address: str) -> tuple[bool, str]:
+    """Checks if address is a valid Solana address (cached per address)."""
+    # Basic check of Solana address length (44 characters in base58)
+    if len(address) != 44:
+        return False, "Invalid Solana address length"
+    try:
+        decoded = base58.b58decode(address)
+    except ValueError:
+        return False, "Invalid Solana address format"
+    # Solana addresses should decode to 32 bytes
+    if len(decoded) != 32:
+        return False, "Invalid Solana address format"
+    return True, "Solana address is valid"
+
+
+class Wallet:
+    """The payer keypair stored base58-encoded in ``path``."""
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.pubkey: Optional[Pubkey] = None
+        self._keypair: Optional[Keypair] = None
+        self._mtime: Optional[int] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def load(self) -> tuple[Optional[Keypair], str]:
+        """Returns (keypair, message); keypair is None when it cannot be loaded."""
+        with self._lock:
+            now = time.monotonic()
+            if self._keypair is not None and now - self._checked < self.check_interval:
+                return self._keypair, "Private key loaded"
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                self._keypair = self.pubkey = self._mtime = None
+                return None, "Private key file not found"
+            self._checked = now
+            if self._keypair is not None and mtime == self._mtime:
+                return self._keypair, "Private key loaded"
+
+            try:
+                with open(self.path, "r") as f:
+                    keypair = Keypair.from_bytes(base58.b58decode(f.read().strip()))
+            except Exception as e:
+                self._keypair = self.pubkey = self._mtime = None
+                return None, f"Error loading private key: {str(e)}"
+
+            self._keypair = keypair
+            self.pubkey = keypair.pubkey()
+            self._mtime = mtime
+            metrics.incr("wallet.loads")
+            print(f"[Wallet] Loaded {self.pubkey}")
+            return keypair, "Private key loaded"
+
+    def invalidate(self):
+        with self._lock:
+            self._keypair = self.pubkey = self._mtime = None
@@ -8,6 +8,8 @@ import numpy as np
 import cv2
 import roslibpy
 
+from brewie.rosbridge import cbor_loads
+
 class Subscriber(Protocol):
     def receive_binary(self) -> bytes:
         ...
@@ -19,11 +21,18 @@ class Image:
         self.subscriber = subscriber
         self.topic = topic
 
-    def subscribe(self, save_path: Optional[str] = None) -> Optional[bytes]:
+    def subscribe(self, save_path: Optional[str] = None, compression: Optional[str] = None) -> Optional[bytes]:
+        # compression="cbor" asks rosbridge for a binary frame; the pixel
+        # data then arrives as raw bytes instead of base64 text.
         try:
             subscribe_msg = {
                 "op": "subscribe"
             }
+            if compression is not None:
+                if compression != "cbor":
+                    print(f"[Image] Unsupported compression: {compression}")
+                    return None
+                subscribe_msg["compression"] = compression
             self.subscriber.send( self.topic, 'sensor_msgs/Image', subscribe_msg )
 
             raw = self.subscriber.receive_binary()
@@ -31,20 +40,23 @@ class Image:
                 print("[Image] No data received from subscriber")
                 return None
 
-            if isinstance(raw, bytes):
-                raw = raw.decode("utf-8")
+            if compression == "cbor":
+                msg = cbor_loads(raw)["msg"]
+            else:
+                if isinstance(raw, bytes):
+                    raw = raw.decode("utf-8")
 
-            msg = json.loads(raw)
-            msg = msg["msg"]
+                msg = json.loads(raw)
+                msg = msg["msg"]
 
             # Extract metadata
             height = msg["height"]
             width = msg["width"]
             encoding = msg["encoding"]
-            data_b64 = msg["data"]
+            data = msg["data"]
 
-            # Decode base64 to raw bytes
-            image_bytes = base64.b64decode(data_b64)
+            # Binary frames carry the pixels as a memoryview, JSON as base64
+            image_bytes = data if isinstance(data, memoryview) else base64.b64decode(data)
             img_np = np.frombuffer(image_bytes, dtype=np.uint8)
 
             # Handle encoding
@@ -1,31 +1,48 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Image
 from typing import List, Any, Optional
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import math
 import time
 import os
 import roslibpy
-import base64
 import cv2
 from datetime import datetime
-import numpy as np
 import qrcode
-from pyzbar import pyzbar
 import json
 import requests
-from solana.rpc.api import Client
-from solana.rpc.types import TxOpts
 from solana.rpc.commitment import Commitment
 from solders.transaction import Transaction
 from solders.keypair import Keypair
 from solders.pubkey import Pubkey as PublicKey
 from solders.system_program import TransferParams, transfer
 from solders.message import Message
-from solders.hash import Hash
 from solders.address_lookup_table_account import AddressLookupTableAccount
 import base58
 
 from together import Together
-import base64
+
+from brewie.actions import ActionCatalog
+from brewie.camera import CameraSubscriber
+from brewie.colorfilter import ColorPrefilter
+from brewie.executor import ActionExecutor
+from brewie.fleet import Fleet, parse_robots
+from brewie.head import JointMonitor
+from brewie.imaging import ENCODINGS, VisionPreprocessor, frame_bytes
+from brewie.metrics import metrics
+from brewie.motion import MotionScheduler
+from brewie.payments import PaymentConfirmer
+from brewie.payouts import pack_transfers
+from brewie.primitives import MotionLibrary
+from brewie.qr import QRScanner, decode_qr
+from brewie.solana_rpc import SolanaRPC
+from brewie.storage import CaptureIndex, ImageWriter
+from brewie.topics import TopicPool
+from brewie.sweep import SweepEngine, even_positions, parse_positions
+from brewie.wallet import Wallet, validate_address
+from brewie.vlmcache import TargetCache, phash
+from brewie.walk import WalkStream
 
 
 def ensure_directories():
@@ -44,62 +61,118 @@ def ensure_directories():
 
 
 LLMclient = Together()
-ROSclient = roslibpy.Ros(host='localhost', port=9090)
-
-pan = roslibpy.Topic(ROSclient, '/head_pan_controller/command', 'std_msgs/Float64')
-tilt = roslibpy.Topic(ROSclient, '/head_tilt_controller/command', 'std_msgs/Float64')
-joy = roslibpy.Topic(ROSclient, '/joy', 'sensor_msgs/Joy')
-image_topic = roslibpy.Topic(ROSclient, '/camera/image_raw/compressed', 'sensor_msgs/CompressedImage',queue_size=1,queue_length=1)
-actionlist = roslibpy.Topic(ROSclient, "/action_groups_data", "std_msgs/String")
-action = roslibpy.Topic(ROSclient, '/app/set_action', 'std_msgs/String')
-
-
-class CameraSubscriber:
-    def __init__(self, Rclient, imTop):
-        self.last_image = None
-        self.client = Rclient
-        self.image_topic = imTop
-
-    def on_image_received(self, message):
-        # Callback that is called when a new message is received
-        self.last_image = message
-
-    def get_last_image(self):
-        # Method that returns the last saved image
-        return self.last_image
-    def subs(self):
-        self.image_topic.subscribe(self.on_image_received)
-
-Csubscriber = CameraSubscriber(ROSclient,image_topic)
-
-def get_files_in_directory(directory_path):
-
-  files = []
-  for item in os.listdir(directory_path):
-    item_path = os.path.join(directory_path, item)
-    if os.path.isfile(item_path):
-      files.append(item)
-  return files
-
-def encode_image(image_path):
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
-
-
-def photo_cln(folder_path):
-
-    if not os.path.isdir(folder_path):
-        print(f"Error: Path '{folder_path}' is invalid")
-        return
-
-    for filename in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, filename)
-        try:
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-                print(f"DELETED: {file_path}")
-        except Exception as e:
-            print(f"Delete error {file_path}: {e}")
+ROS_HOST = os.getenv("BREWIE_ROS_HOST", 'localhost')
+ROS_PORT = int(os.getenv("BREWIE_ROS_PORT", "9090"))
+# Robots driven by this server, "id=host[:port],..."; empty is one robot
+# ("brewie") at BREWIE_ROS_HOST:BREWIE_ROS_PORT. Each robot connects on first use.
+ROBOTS = parse_robots(os.getenv("BREWIE_ROBOTS", ""), ROS_HOST, ROS_PORT)
+DEFAULT_ROBOT = os.getenv("BREWIE_DEFAULT_ROBOT", "")
+ROBOT_CONNECT_TIMEOUT = float(os.getenv("BREWIE_ROBOT_CONNECT_TIMEOUT", "10"))
+
+# Actions run one at a time for their catalog duration; with a completion
+# topic (std_msgs/String naming the finished action) they end on its message.
+ACTION_DONE_TOPIC = os.getenv("BREWIE_ACTION_DONE_TOPIC", "")
+ACTION_DEFAULT_DURATION = float(os.getenv("BREWIE_ACTION_DEFAULT_DURATION", "2.0"))
+ACTION_MARGIN = float(os.getenv("BREWIE_ACTION_MARGIN", "0.05"))
+
+
+FRAME_BUFFER_SIZE = int(os.getenv("BREWIE_FRAME_BUFFER", "8"))
+# "json" (default), or "cbor" / "cbor-raw" for binary frames without base64
+IMAGE_TRANSPORT = os.getenv("BREWIE_IMAGE_TRANSPORT", "json")
+# "stamp" uses the camera header stamp, "received" the local arrival time
+FRAME_CLOCK = os.getenv("BREWIE_FRAME_CLOCK", "stamp")
+# The camera is subscribed while a tool needs frames (full rate), then kept
+# throttled to one frame per BREWIE_CAMERA_BACKGROUND_MS and closed after
+# BREWIE_CAMERA_IDLE seconds unused (0 keeps it subscribed).
+CAMERA_BACKGROUND_MS = int(os.getenv("BREWIE_CAMERA_BACKGROUND_MS", "1000"))
+CAMERA_IDLE_TIMEOUT = float(os.getenv("BREWIE_CAMERA_IDLE", "30"))
+
+# Sweep frames are downscaled and re-encoded before the VLM call; with
+# BREWIE_VLM_MOSAIC=1 they are tiled into one numbered image instead.
+vision_preprocessor = VisionPreprocessor(
+    max_side=int(os.getenv("BREWIE_VLM_MAX_SIDE", "768")),
+    fmt=os.getenv("BREWIE_VLM_FORMAT", "jpeg"),
+    quality=int(os.getenv("BREWIE_VLM_QUALITY", "80")),
+    mosaic=os.getenv("BREWIE_VLM_MOSAIC", "0") == "1",
+    mosaic_side=int(os.getenv("BREWIE_VLM_MOSAIC_SIDE", "1536")),
+)
+
+# Sniper sweep: "pan[:tilt]" positions, left to right. Wide rooms usually
+# need 5-7 positions, e.g. "1.2,0.8,0.4,0,-0.4,-0.8,-1.2".
+SWEEP_POSITIONS = parse_positions(os.getenv("BREWIE_SWEEP_POSITIONS", "1.2,0,-1.2"))
+SWEEP_MOVE_DURATION = float(os.getenv("BREWIE_SWEEP_MOVE_DURATION", "0.3"))
+SWEEP_WORKERS = int(os.getenv("BREWIE_SWEEP_WORKERS", "2"))
+
+# VLM answers are reused while the sweep frames stay perceptually the same
+target_cache = TargetCache(
+    max_entries=int(os.getenv("BREWIE_VLM_CACHE_SIZE", "64")),
+    ttl=float(os.getenv("BREWIE_VLM_CACHE_TTL", "30")),
+    max_distance=int(os.getenv("BREWIE_VLM_CACHE_DISTANCE", "8")),
+)
+
+# Simple colored targets ("purple ball") can be picked locally by HSV blob
+# size; less certain cases still go to the VLM.
+COLOR_PREFILTER = os.getenv("BREWIE_COLOR_PREFILTER", "0") == "1"
+color_prefilter = ColorPrefilter(threshold=float(os.getenv("BREWIE_COLOR_PREFILTER_CONFIDENCE", "0.6")))
+
+# BrewPay scans camera frames in memory: each frame is tried at these
+# scales (first hit wins), optionally thresholded, and fresh frames are
+# taken until the timeout.
+QR_SCALES = tuple(float(scale) for scale in os.getenv("BREWIE_QR_SCALES", "1.0,0.5,2.0").split(","))
+QR_ADAPTIVE = os.getenv("BREWIE_QR_ADAPTIVE", "1") == "1"
+QR_TIMEOUT = float(os.getenv("BREWIE_QR_TIMEOUT", "3.0"))
+
+# One RPC client for all payments; BrewPay prefetches the blockhash while
+# the head tilts and the QR code is scanned.
+solana_rpc = SolanaRPC(
+    os.getenv("BREWIE_SOLANA_RPC", "https://api.mainnet-beta.solana.com"),
+    blockhash_ttl=float(os.getenv("BREWIE_BLOCKHASH_TTL", "30")),
+    keep_warm=float(os.getenv("BREWIE_SOLANA_KEEP_WARM", "60")),
+)
+# The payer keypair is decoded once and reloaded only when the file changes
+wallet = Wallet("master_sh/sol_private_key")
+# Payments submitted without waiting are confirmed by one background loop
+payment_confirmer = PaymentConfirmer(solana_rpc, poll=float(os.getenv("BREWIE_PAYMENT_POLL", "0.5")))
+
+# Timed motions run off the MCP event loop; jobs moving the same part
+# ("head" or "legs") run in order, others side by side
+MOTION_WORKERS = int(os.getenv("BREWIE_MOTION_WORKERS", "2"))
+# Timed sequences (defend, sniper fire, steps) are declared in motions.json
+# and prepared once per robot
+MOTIONS_PATH = os.getenv("BREWIE_MOTIONS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "motions.json"))
+# Walks stream the joystick axes at a fixed rate instead of a move+stop pulse
+WALK_RATE = float(os.getenv("BREWIE_WALK_RATE", "10"))
+WALK_DEADMAN = float(os.getenv("BREWIE_WALK_DEADMAN", "1.0"))
+WALK_MAX_SECONDS = float(os.getenv("BREWIE_WALK_MAX_SECONDS", "30"))
+# Ground speed in m/s at full stick, used to turn a distance into walk time
+WALK_SPEED = float(os.getenv("BREWIE_WALK_SPEED", "0.1"))
+
+# Extra time after a head command's duration before a frame counts as fresh
+HEAD_SETTLE_MARGIN = float(os.getenv("BREWIE_HEAD_SETTLE", "0.1"))
+HEAD_MOVE_TIMEOUT = float(os.getenv("BREWIE_HEAD_TIMEOUT", "2.0"))
+# Message type of /head_*_controller/state, e.g. dynamixel_msgs/JointState.
+# Leave empty when the controllers do not publish state.
+HEAD_STATE_TYPE = os.getenv("BREWIE_HEAD_STATE_TYPE", "")
+
+# Every capture gets an id from the index; old files are pruned by count
+# and/or total size instead of wiping the folder.
+capture_index = CaptureIndex(
+    "photos/environment",
+    "photos/manifest.jsonl",
+    max_files=int(os.getenv("BREWIE_KEEP_CAPTURES", "200")),
+    max_bytes=int(os.getenv("BREWIE_KEEP_BYTES", "0")),
+)
+
+# Captures are written to disk by background threads. Format is "png",
+# "jpeg" or "original" (camera bytes as received, no re-encode).
+image_writer = ImageWriter(
+    fmt=os.getenv("BREWIE_IMAGE_FORMAT", "png"),
+    jpeg_quality=int(os.getenv("BREWIE_JPEG_QUALITY", "90")),
+    png_level=int(os.getenv("BREWIE_PNG_LEVEL", "1")),
+    max_queue=int(os.getenv("BREWIE_WRITER_QUEUE", "16")),
+    policy=os.getenv("BREWIE_WRITER_POLICY", "block"),
+    on_written=capture_index.on_written,
+)
 
 def detect_qr_code(image_path):
     """Detects QR code on image and returns its content"""
@@ -110,14 +183,13 @@ def detect_qr_code(image_path):
             return None, "Failed to load image"
         
         # Decode QR codes
-        qr_codes = pyzbar.decode(image)
+        qr_codes, _ = decode_qr(image, QR_SCALES, QR_ADAPTIVE)
         
         if not qr_codes:
             return None, "QR code not found on image"
         
         # Return content of the first found QR code
-        qr_data = qr_codes[0].data.decode('utf-8')
-        return qr_data, "QR code successfully recognized"
+        return qr_codes[0], "QR code successfully recognized"
         
     except Exception as e:
         return None, f"Error recognizing QR code: {str(e)}"
@@ -125,51 +197,31 @@ def detect_qr_code(image_path):
 def validate_sol_address(address):
     """Checks if address is a valid Solana address"""
     try:
-        # Basic check of Solana address length (44 characters in base58)
-        if len(address) != 44:
-            return False, "Invalid Solana address length"
-        
-        # Check that address contains only valid base58 characters
-        import base58
-        try:
-            decoded = base58.b58decode(address)
-            if len(decoded) != 32:  # Solana addresses should decode to 32 bytes
-                return False, "Invalid Solana address format"
-        except:
-            return False, "Invalid Solana address format"
-        
-        return True, "Solana address is valid"
+        # Results are cached, QR scans see the same addresses repeatedly
+        return validate_address(address)
     except Exception as e:
         return False, f"Address validation error: {str(e)}"
 
 def load_private_key():
-    """Loads private key from master_sh file"""
-    try:
-        key_file = "master_sh/sol_private_key"
-        if not os.path.exists(key_file):
-            return None, "Private key file not found"
-        
-        with open(key_file, 'r') as f:
-            private_key = f.read().strip()
-        
-        return private_key, "Private key loaded"
-    except Exception as e:
-        return None, f"Error loading private key: {str(e)}"
+    """Returns the payer Keypair from master_sh/sol_private_key (cached)"""
+    return wallet.load()
 
-def transfer_sol(to_address, amount, private_key):
-    """Performs real SOL transfer in Solana network"""
+def transfer_sol(to_address, amount, private_key, wait=True):
+    """Performs real SOL transfer in Solana network
+
+    With wait=False it returns right after sending and the confirmation is
+    tracked by payment_confirmer.
+    """
     try:
         print(f"Starting transfer of {amount} SOL to address {to_address}")
         
-        # Connect to Solana RPC (mainnet)
-        rpc_url = "https://api.mainnet-beta.solana.com"
-        client = Client(rpc_url)
-        
         # Create Keypair from private key
         try:
-            # Decode private key from base58
-            private_key_bytes = base58.b58decode(private_key)
-            keypair = Keypair.from_bytes(private_key_bytes)
+            # Decode private key from base58 unless a loaded Keypair is passed
+            if isinstance(private_key, Keypair):
+                keypair = private_key
+            else:
+                keypair = Keypair.from_bytes(base58.b58decode(private_key))
             print(f"Wallet loaded: {keypair.pubkey()}")
         except Exception as e:
             return False, f"Error loading private key: {str(e)}"
@@ -183,65 +235,77 @@ def transfer_sol(to_address, amount, private_key):
         # Convert SOL to lamports (1 SOL = 1,000,000,000 lamports)
         lamports = int(amount * 1_000_000_000)
         
-        # Get latest block hash
-        try:
-            recent_blockhash = client.get_latest_blockhash()
-            if recent_blockhash.value is None:
-                return False, "Failed to get latest block hash"
-        except Exception as e:
-            return False, f"Error getting block hash: {str(e)}"
+        for fresh in (False, True):
+            # Get latest block hash (usually prefetched by BrewPay)
+            try:
+                with metrics.timer("payment.blockhash"):
+                    recent_blockhash, last_valid_block_height = solana_rpc.blockhash(fresh=fresh)
+            except Exception as e:
+                return False, f"Error getting block hash: {str(e)}"
         
-        # Create transaction
-        try:
-            # Create transfer instruction
-            transfer_instruction = transfer(
-                TransferParams(
-                    from_pubkey=keypair.pubkey(),
-                    to_pubkey=recipient_pubkey,
-                    lamports=lamports
+            # Create transaction
+            try:
+                # Create transfer instruction
+                transfer_instruction = transfer(
+                    TransferParams(
+                        from_pubkey=keypair.pubkey(),
+                        to_pubkey=recipient_pubkey,
+                        lamports=lamports
+                    )
                 )
-            )
             
-            # Create transaction message
-            message = Message.new_with_blockhash(
-                instructions=[transfer_instruction],
-                payer=keypair.pubkey(),
-                blockhash=Hash.from_string(str(recent_blockhash.value.blockhash))
-            )
+                # Create transaction message
+                message = Message.new_with_blockhash(
+                    instructions=[transfer_instruction],
+                    payer=keypair.pubkey(),
+                    blockhash=recent_blockhash
+                )
             
-            # Create transaction
-            transaction = Transaction.new_unsigned(message)
+                # Create transaction
+                transaction = Transaction.new_unsigned(message)
             
-        except Exception as e:
-            return False, f"Error creating transaction: {str(e)}"
+            except Exception as e:
+                return False, f"Error creating transaction: {str(e)}"
         
-        # Sign transaction
-        try:
-            transaction.sign([keypair], Hash.from_string(str(recent_blockhash.value.blockhash)))
-            print("Transaction signed")
-        except Exception as e:
-            return False, f"Error signing transaction: {str(e)}"
+            # Sign transaction
+            try:
+                with metrics.timer("solana.sign"):
+                    transaction.sign([keypair], recent_blockhash)
+                print("Transaction signed")
+            except Exception as e:
+                return False, f"Error signing transaction: {str(e)}"
+
+            # The same transfer signed with the same cached blockhash would
+            # be dropped by the network as a duplicate
+            if not solana_rpc.was_sent(transaction.signatures[0]):
+                break
+        else:
+            return False, "Duplicate transfer: blockhash did not advance"
         
         # Send transaction
         try:
             print("Sending transaction to network...")
-            result = client.send_transaction(
-                transaction,
-                opts=TxOpts(skip_preflight=False, preflight_commitment="confirmed")
-            )
+            try:
+                signature = solana_rpc.send(transaction)
+            except Exception:
+                # A stale cached blockhash must not fail the next attempt too
+                solana_rpc.invalidate()
+                raise
             
-            if result.value is None:
+            if signature is None:
                 return False, "Transaction was not sent"
             
-            signature = result.value
             print(f"Transaction sent: {signature}")
+
+            if not wait:
+                job = payment_confirmer.submit(signature, to_address, amount, last_valid_block_height)
+                return True, f"Transfer of {amount} SOL submitted as payment job {job.id}, check it with payment_status"
             
             # Wait for confirmation
             print("Waiting for transaction confirmation...")
-            confirmation = client.confirm_transaction(signature, commitment="confirmed")
+            confirmation_status = solana_rpc.confirm(signature, last_valid_block_height)
             
             # Check confirmation status
-            confirmation_status = confirmation.value[0].confirmation_status
             print(f"Confirmation status: {confirmation_status}")
             print(f"Status type: {type(confirmation_status)}")
             
@@ -266,88 +330,152 @@ def transfer_sol(to_address, amount, private_key):
     except Exception as e:
         return False, f"Critical error during transfer execution: {str(e)}"
 
+def transfer_sol_batch(to_addresses, amount, private_key, wait=False):
+    """Sends amount SOL to every address with as few transactions as possible
+
+    Transfers are packed up to the transaction size limit, signed with one
+    blockhash and sent concurrently. With wait=False each transaction
+    becomes a payment job tracked by payment_confirmer.
+    """
+    try:
+        keypair = private_key if isinstance(private_key, Keypair) else Keypair.from_bytes(base58.b58decode(private_key))
+    except Exception as e:
+        return False, f"Error loading private key: {str(e)}"
+
+    try:
+        recipients = [PublicKey.from_string(address) for address in to_addresses]
+    except Exception as e:
+        return False, f"Invalid recipient address: {str(e)}"
 
-mcp = FastMCP("brewie-mcp-server")
-actions_groups_data: dict[str, str] = None
+    lamports = int(amount * 1_000_000_000)
 
+    for fresh in (False, True):
+        try:
+            recent_blockhash, last_valid_block_height = solana_rpc.blockhash(fresh=fresh)
+        except Exception as e:
+            return False, f"Error getting block hash: {str(e)}"
 
-@mcp.tool(description="This tool makes a robot move by one step in any direction." \
-"Tool uses joystick emulate [z][x] -1.0 for right, 1.0 for left, -1.0 for backward, 1.0 for forward")
-def make_step(x: float, z: float):
-    # Validate input
-    right_left = x
-    forward_backward = z
-    
-    # Clamp values between -1.0 and 1.0
-    right_left = max(-1.0, min(1.0, right_left))
-    forward_backward = max(-1.0, min(1.0, forward_backward))
-    
-    message = {
-        'axes': [right_left, forward_backward, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-        'buttons': [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-    }
+        try:
+            batches = []
+            start = 0
+            with metrics.timer("solana.sign"):
+                for message in pack_transfers(keypair.pubkey(), [(recipient, lamports) for recipient in recipients], recent_blockhash):
+                    transaction = Transaction.new_unsigned(message)
+                    transaction.sign([keypair], recent_blockhash)
+                    count = len(message.instructions)
+                    batches.append((transaction, to_addresses[start:start + count]))
+                    start += count
+        except Exception as e:
+            return False, f"Error creating transaction: {str(e)}"
 
-    joy.publish(message)
+        if not any(solana_rpc.was_sent(transaction.signatures[0]) for transaction, _ in batches):
+            break
+    else:
+        return False, "Duplicate transfer: blockhash did not advance"
 
-    message_to_stop = {
-        'axes': [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-        'buttons': [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-    }
+    print(f"Sending {len(recipients)} transfers in {len(batches)} transactions...")
 
-    joy.publish(message_to_stop)
+    def send(batch):
+        try:
+            return solana_rpc.send(batch[0]), None
+        except Exception as e:
+            solana_rpc.invalidate()
+            return None, str(e)
 
-    return "one step!"
+    with ThreadPoolExecutor(max_workers=min(8, len(batches))) as pool:
+        sent = list(pool.map(send, batches))
 
-@mcp.tool(description="This tool allows you to defend yourself from your opponents. Call it to protect me from opponent. One call to one opponent. I will tell you where the enemy is in relation to you" \
-"Tool uses 2 float params (write it without "") for description opponent's position [rotate] were 1.2 is maximum of right -1.2 maximum left [UPDOWN] where -0.3 is maximum down, 0.2 is maximum UP ")
-def defend(rotate: float, UPDOWN: float):
-    # Clamp values between -1.0 and 1.0
-    rotate_fx = max(-1.2, min(1.2, rotate))
-    UPDOWN_fx = max(-0.3, min(0.2, UPDOWN))
-
-    panmsg = roslibpy.Message({
-        'position': rotate_fx,
-        'duration': 0.5,
-    })
-    
+        errors = [error for signature, error in sent if signature is None]
+        delivered = [(signature, batch[1]) for (signature, _), batch in zip(sent, batches) if signature is not None]
+        if not delivered:
+            return False, f"Error sending transactions: {errors[0] if errors else 'not sent'}"
 
-    tiltmsg = roslibpy.Message({
-        'position': UPDOWN_fx,
-        'duration': 0.5,
-    })
+        paid = sum(len(addresses) for _, addresses in delivered)
+        if not wait:
+            jobs = [payment_confirmer.submit(signature, addresses, amount * len(addresses), last_valid_block_height) for signature, addresses in delivered]
+            message = f"{paid} of {len(recipients)} transfers of {amount} SOL submitted as payment jobs {', '.join(str(job.id) for job in jobs)}, check them with payment_status"
+            return not errors, message
 
+        def confirm(item):
+            # One failed status check must not hide the transactions that went through
+            try:
+                return solana_rpc.confirm(item[0], last_valid_block_height)
+            except Exception as e:
+                print(f"[Payments] Could not confirm {item[0]}: {e}")
+                return None
 
-    headZeroMsg = roslibpy.Message({
-        'position': 0,
-        'duration': 0.5,
-    })
+        statuses = list(pool.map(confirm, delivered))
 
-    defStarmsg = roslibpy.Message({
-        'axes': [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-        'buttons': [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-    })
+    confirmed = sum(len(addresses) for (_, addresses), status in zip(delivered, statuses) if "confirmed" in str(status).lower() or "finalized" in str(status).lower())
+    signatures = ", ".join(str(signature) for signature, _ in delivered)
+    return confirmed == len(recipients), f"{confirmed} of {len(recipients)} transfers of {amount} SOL confirmed in {len(batches)} transactions, sent {signatures}"
 
-    defEndmsg = roslibpy.Message({
-        'axes': [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-        'buttons': [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-    })
 
-    pan.publish(panmsg)    
-    tilt.publish(tiltmsg)
-    time.sleep(0.8)
-    joy.publish(defStarmsg)
-    time.sleep(1.2)
-    joy.publish(defEndmsg)
-    time.sleep(0.1)
-    pan.publish(headZeroMsg)
-    time.sleep(0.1)
-    tilt.publish(headZeroMsg)
-    time.sleep(0.5)
+mcp = FastMCP(
+    "brewie-mcp-server",
+    host=os.getenv("BREWIE_MCP_HOST", "127.0.0.1"),
+    port=int(os.getenv("BREWIE_MCP_PORT", "8000")),
+)
+
 
-    #joy.unadvertise()
-    #tilt.unadvertise()
-    #pan.unadvertise()
+@mcp.tool(description="This tool makes a robot move by one step in any direction." \
+"Tool uses joystick emulate [z][x] -1.0 for right, 1.0 for left, -1.0 for backward, 1.0 for forward. " \
+"To walk, give duration in seconds or distance in meters: the joystick is held for that long. " \
+"Calling again while walking changes direction and the remaining time of the same walk; a call without duration or distance stops it. " \
+"Set wait to false to return at once with a motion job id (see motion_status); a walk started that way stops unless it is called again within the deadman interval. " \
+"Optional robot_id picks the robot (empty for the default one, see list_robots).")
+async def make_step(x: float, z: float, duration: float = 0.0, distance: float = 0.0, wait: bool = True, robot_id: str = ""):
+    robot, error = await asyncio.to_thread(robot_for, robot_id)
+    if robot is None:
+        return error
+    walk = robot.walk
+    if duration <= 0 and distance <= 0:
+        if walk.stop():
+            return "Stopped walking"
+        # x/z are clamped to -1.0..1.0 by the "step" primitive
+        job = robot.motion.submit(robot.motion_library.timeline("step", x=x, z=z))
+        if not wait:
+            return f"Stepping as motion job {job.id}"
+        await job
+        return "one step!"
+
+    if distance > 0:
+        speed = WALK_SPEED * min(1.0, math.hypot(x, z))
+        if speed <= 0:
+            return "Error: walking a distance needs a non-zero x or z"
+        duration = distance / speed
+    if duration > walk.max_seconds:
+        print(f"[Walk] {duration:.1f}s requested, walking {walk.max_seconds:g}s")
+    job, updated = walk.drive(x, z, duration)
+    if updated:
+        return f"Updated walk (motion job {job.id}): {min(duration, walk.max_seconds):.1f}s from now"
+    if not wait:
+        return f"Walking as motion job {job.id}, call again within {walk.deadman:g}s to keep walking"
+    # This waiting call is the walk's client; if it goes away the walk stops
+    while not job.done:
+        walk.keepalive()
+        await asyncio.wait([asyncio.wrap_future(job.future)], timeout=walk.deadman / 2)
+    result = await job
+    if result["reason"] == "deadman":
+        return f"Error: walk stopped after {result['seconds']}s, lost the rosbridge connection"
+    if result["reason"] == "stalled":
+        return f"Error: walk stopped after {result['seconds']}s, no command within {walk.deadman:g}s"
+    return f"Walked {result['seconds']}s ({result['messages']} joystick messages, {result['updates']} updates)"
 
+@mcp.tool(description="This tool allows you to defend yourself from your opponents. Call it to protect me from opponent. One call to one opponent. I will tell you where the enemy is in relation to you" \
+"Tool uses 2 float params (write it without "") for description opponent's position [rotate] were 1.2 is maximum of right -1.2 maximum left [UPDOWN] where -0.3 is maximum down, 0.2 is maximum UP. " \
+"Set wait to false to return at once with a motion job id (see motion_status). " \
+"Optional robot_id picks the robot (empty for the default one, see list_robots).")
+async def defend(rotate: float, UPDOWN: float, wait: bool = True, robot_id: str = ""):
+    robot, error = await asyncio.to_thread(robot_for, robot_id)
+    if robot is None:
+        return error
+    # Aim, fire and re-center; the "defend" primitive clamps rotate to +-1.2 and UPDOWN to -0.3..0.2
+    guard = robot.motion_library.timeline("defend", rotate=rotate, updown=UPDOWN)
+    job = robot.motion.submit(guard)
+    if not wait:
+        return f"Defending as motion job {job.id}"
+    await job
 
     return "one less threat!"
 
@@ -355,231 +483,463 @@ def defend(rotate: float, UPDOWN: float):
 
 
 
-@mcp.tool(description='This tool getting action from topic on robot and write on python dict[file_name, description]')
-def get_available_actions():
-    global actions_groups_data  # Needed to modify the global variable
-    actions_groups_data = None  # Reset before use
-    
-    
-    def on_action_received(msg):
-        global actions_groups_data
-        actions_groups_data = msg
+@mcp.tool(description='This tool returns the actions available on the robot with their name, frame count and duration in seconds. ' \
+"The result carries the catalog version; pass newer_than with a version you already have to wait (up to timeout seconds) for a changed list. " \
+"Optional robot_id picks the robot (empty for the default one, see list_robots).")
+async def get_available_actions(newer_than: int = 0, timeout: float = 5.0, robot_id: str = ""):
+    robot, error = await asyncio.to_thread(robot_for, robot_id)
+    if robot is None:
+        return error
+    # The long-poll for a newer catalog waits off the event loop
+    actions, version = await asyncio.to_thread(robot.action_catalog.wait, newer_than=newer_than, timeout=timeout)
 
-    actionlist.subscribe(on_action_received)
+    return {
+        "version": version,
+        "actions": [
+            {"name": entry["name"], "frames": entry["frames"], "duration": entry["duration"]}
+            for entry in actions
+        ],
+    }
 
-    start_time = time.time()
-    while actions_groups_data is None and (time.time() - start_time) < 5:
-        time.sleep(0.1)
+@mcp.tool(description="This tool run action. By default it returns when the action has finished (mode sync). " \
+"Mode async returns a job id at once; mode queue takes several comma-separated action names and plays them back to back. Check jobs with action_status. " \
+"Optional robot_id picks the robot (empty for the default one, see list_robots).")
+async def run_action(action_name: str, mode: str = "sync", timeout: float = 30.0, robot_id: str = ""):
+    if mode not in ("sync", "async", "queue"):
+        return f"Error: unknown mode {mode}, use sync, async or queue"
+    names = [name.strip() for name in action_name.split(",")] if mode == "queue" else [action_name.strip()]
+    names = [name[: -len(".d6a")] if name.endswith(".d6a") else name for name in names if name]
+    if not names:
+        return "Error: no action name"
+    robot, error = await asyncio.to_thread(robot_for, robot_id)
+    if robot is None:
+        return error
+
+    jobs = [robot.action_executor.submit(name) for name in names]
+    if mode == "sync":
+        # The action plays for seconds; wait for it off the event loop
+        if not await asyncio.to_thread(jobs[0].wait, timeout):
+            return f"Action {names[0]} still running as job {jobs[0].id}"
+        return f"Action {names[0]} {jobs[0].state} after {jobs[0].finished - jobs[0].started:.2f}s"
+
+    def describe(job):
+        duration = "unknown duration" if job.duration is None else f"about {job.duration:.2f}s"
+        return f"{job.name} as job {job.id} ({duration})"
+
+    return "Action queued: " + ", ".join(describe(job) for job in jobs)
+
+
+@mcp.tool(description="This tool reports the state of actions started by run_action (queued, running, done or timeout). " \
+"Pass the job id, or 0 to list recent actions; wait is how many seconds to wait for the job to finish. " \
+"Optional robot_id picks the robot (empty for the default one, see list_robots).")
+async def action_status(job_id: int = 0, wait: float = 0.0, robot_id: str = ""):
+    robot, error = await asyncio.to_thread(robot_for, robot_id)
+    if robot is None:
+        return error
+    if job_id:
+        job = robot.action_executor.get(job_id)
+        if job is None:
+            return f"Error: unknown action job {job_id}"
+        if wait > 0 and not job.done:
+            await asyncio.to_thread(job.wait, wait)
+        return job.status()
+    return [job.status() for job in robot.action_executor.jobs()]
+
+def move_head(topic, msg):
+    """Publishes a head command and returns the time it was sent."""
+    command_time = time.time()
+    topic.publish(msg)
+    return command_time
+
+
+def commanded(topic):
+    """Last commanded position of a head topic (0.0 before the first command)."""
+    return topic.last['position'] if topic.last else 0.0
+
+
+def head_pose(robot):
+    """Current head pan/tilt, measured when joint state is available."""
+    pose = {}
+    for key, topic, state in (('pan', robot.pan, robot.pan_state), ('tilt', robot.tilt, robot.tilt_state)):
+        if state is not None and state.position is not None:
+            pose[key] = state.position
+        else:
+            pose[key] = commanded(topic)
+    return pose
 
-    actionlist.unsubscribe()
-    
 
-    if actions_groups_data:
-        return list(actions_groups_data.items())  # Convert dict to list of tuples
-    else:
-        return []
+def wait_head(state, command_time, msg):
+    """Waits until a head command has been executed.
 
-@mcp.tool(description="This tool run action")
-def run_action(action_name: str):
+    Returns early when the joint state reports the target, otherwise once
+    the command duration plus settle margin has passed.
+    """
+    settle = msg['duration'] + HEAD_SETTLE_MARGIN
+    if state is not None and state.wait_until(msg['position'], timeout=HEAD_MOVE_TIMEOUT, since=command_time) is not None:
+        return
+    time.sleep(max(0.0, command_time + settle - time.time()))
 
-    message = ({
-        'data': action_name
-    })
 
-    return action.publish(message)
+def capture_after_move(robot, state, command_time, msg):
+    """Captures the first frame taken after a head command has settled."""
+    frame = robot.camera.wait_for_fresh_frame(
+        command_time,
+        settle=msg['duration'] + HEAD_SETTLE_MARGIN,
+        timeout=HEAD_MOVE_TIMEOUT,
+        joint=state,
+        target=msg['position'],
+    )
+    if frame is None:
+        print("[Image] No fresh frame after head move")
+        return None, "No data"
+    metrics.observe("head.settle", time.time() - command_time)
+    with metrics.timer("image.capture"):
+        return capture_image(robot, frame=frame)
 
-@mcp.tool(description="This tool used to get raw image from robot and save on user pc on directory like downloads")
-def get_image():
-    #TODO IN sniper game back images on 1 side only. I thn what it error from subscriber
-    try:
-        # Get the last message.
-        received_msg = Csubscriber.get_last_image()
 
-        start_time = time.time()
-        while received_msg is None and (time.time() - start_time) < 5:
-            time.sleep(0.1)
+def capture_image(robot, decode: bool = True, frame=None):
+    """Takes the newest camera frame and queues it for saving.
+
+    A specific buffered frame can be passed instead. Returns (capture,
+    message). capture is a dict with the frame, its decoded pixels (None
+    when decode is False), the target path and the write job; it is None
+    on failure.
+    """
+    try:
+        # Wait for a buffered frame; decoded pixels are cached per frame.
+        if frame is None:
+            frame = robot.camera.wait_for_frame(timeout=5)
 
-        if received_msg is None:
+        if frame is None:
             print("[Image] No data received from subscriber")
-            return "No data"
+            return None, "No data"
 
-        msg = received_msg
+        img_cv = None
+        if decode:
+            try:
+                img_cv = frame.decode()
+            except ValueError as e:
+                print(f"[Image] {e}")
+                return None, "Format error"
 
-        # Check if format is compressed.
-        if 'format' in msg and 'data' in msg:
-            # Process compressed image (CompressedImage)
-            
-            # Decode Base64 data
-            data_b64 = msg['data']
-            image_bytes = base64.b64decode(data_b64)
-            
-            # Convert byte array to NumPy array
-            img_np = np.frombuffer(image_bytes, np.uint8)
-            
-            # Decode image from JPEG/PNG using OpenCV
-            img_cv = cv2.imdecode(img_np, cv2.IMREAD_UNCHANGED)
-            
             if img_cv is None:
-                print(f"[Image] Failed to decode image with OpenCV.")
-                return "Decoding error"
-
-        elif 'height' in msg and 'width' in msg and 'encoding' in msg:
-            # Process uncompressed image (Image)
-            height = msg["height"]
-            width = msg["width"]
-            encoding = msg["encoding"]
-            data_b64 = msg["data"]
-            image_bytes = base64.b64decode(data_b64)
-            img_np = np.frombuffer(image_bytes, dtype=np.uint8)
-
-            if encoding == "rgb8":
-                img_np = img_np.reshape((height, width, 3))
-                img_cv = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-            elif encoding == "bgr8":
-                img_cv = img_np.reshape((height, width, 3))
-            elif encoding == "mono8":
-                img_cv = img_np.reshape((height, width))
-            else:
-                print(f"[Image] Unsupported encoding: {encoding}")
-                return "Format error"
-        else:
-            print("[Image] Unsupported message format.")
-            return "Format error"
-
-        downloads_dir = "photos/environment"
-        # Make sure directory exists.
-        os.makedirs(downloads_dir, exist_ok=True)
-        items = os.listdir(downloads_dir)
+                print("[Image] Failed to decode image with OpenCV.")
+                return None, "Decoding error"
 
-        timestamp = str(len(items))
-        save_path = os.path.join(downloads_dir, f"image_{timestamp}.png")
-        cv2.imwrite(str(save_path), img_cv)
+        record = capture_index.add(
+            image_writer.extension(frame),
+            stamp=frame.stamp,
+            topic=robot.image_topic.name,
+            robot=robot.id,
+            **head_pose(robot),
+        )
+        save_path = record["path"]
+        job = image_writer.submit(save_path, frame, img_cv)
 
-        print(f"[Image] Saved to {save_path}")
+        print(f"[Image] Queued for saving to {save_path}")
 
-        return img_cv
+        return {"frame": frame, "image": img_cv, "path": save_path, "job": job, "record": record}, "Image captured"
 
     except Exception as e:
         print(f"[Image] Failed to receive or decode: {e}")
-        return "Failure"
+        return None, "Failure"
 
-    
-@mcp.tool(description="This tool allows you to play sniper unlike the defender tool here the person says the description of the target and not its position, where it is the robot decides itself" \
-"Tool use one string param, it is description of target to shoot")
-def sniper(targediscr:str):
 
-    print("startsnipet tool")
-    photo_cln("photos/environment")
+def sweep_move(robot, position):
+    """Points the head at a sweep position, returns the pan command time."""
+    pan_position, tilt_position = position
+    if tilt_position is not None and tilt_position != commanded(robot.tilt):
+        move_head(robot.tilt, roslibpy.Message({'position': tilt_position, 'duration': SWEEP_MOVE_DURATION}))
+    return move_head(robot.pan, roslibpy.Message({'position': pan_position, 'duration': SWEEP_MOVE_DURATION}))
 
-    pan = roslibpy.Topic(ROSclient, '/head_pan_controller/command', 'std_msgs/Float64')
-    joy = roslibpy.Topic(ROSclient, '/joy', 'sensor_msgs/Joy')
 
-    fmsg=[]
+def sweep_frame(robot, command_time, position):
+    return robot.camera.wait_for_fresh_frame(
+        command_time,
+        settle=SWEEP_MOVE_DURATION + HEAD_SETTLE_MARGIN,
+        timeout=HEAD_MOVE_TIMEOUT,
+        joint=robot.pan_state,
+        target=position[0],
+    )
 
-    fmsg.append(roslibpy.Message({
-        'position': 1.2,
-        'duration': 0.3,
-    }))
 
+def sweep_encode(frame):
+    image = frame.decode()
+    if image is None:
+        raise ValueError("Failed to decode image")
+    return vision_preprocessor.encode_frame(image), phash(image)
 
-    fmsg.append(roslibpy.Message({
-        'position': 0,
-        'duration': 0.3,
-    }))
 
-    fmsg.append(roslibpy.Message({
-        'position': -1.2,
-        'duration': 0.3,
-    }))
+def vlm_select(target, urls, count):
+    """Asks the VLM which of ``count`` sweep photos shows ``target``.
 
+    Returns the photo index, or None when the answer is not a valid index.
+    """
+    getDescriptionPrompt = vision_preprocessor.prompt(target, count)
+
+    content = [{
+        "type": "text",
+        "text": getDescriptionPrompt
+    }]
+    for url in urls:
+        content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": url
+            }
+        })
 
+    respons = LLMclient.chat.completions.create(
+    model="Qwen/Qwen2.5-VL-72B-Instruct",
+    messages=[{
+        "role": "user",
+        "content": content
+    }],
+    )
 
-    defStarmsg = roslibpy.Message({
-        'axes': [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-        'buttons': [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-    })
+    answer = respons.choices[0].message.content.strip()
+    if answer.isdigit() and int(answer) < count:
+        return int(answer)
+    print(f"[Sweep] Unexpected answer: {answer}")
+    return None
+
+
+def build_robot(robot):
+    """Creates a robot's topics, camera, executors and motions once it is connected."""
+    ros = robot.ros
+    # Publishers are shared by all tools and stay advertised between calls
+    robot.topic_pool = TopicPool(ros)
+    robot.pan = robot.topic_pool.get('/head_pan_controller/command', 'std_msgs/Float64')
+    robot.tilt = robot.topic_pool.get('/head_tilt_controller/command', 'std_msgs/Float64')
+    robot.joy = robot.topic_pool.get('/joy', 'sensor_msgs/Joy')
+    robot.action = robot.topic_pool.get('/app/set_action', 'std_msgs/String')
+    robot.image_topic = roslibpy.Topic(ros, '/camera/image_raw/compressed', 'sensor_msgs/CompressedImage', queue_size=1, queue_length=1)
+    # Kept subscribed so the tools answer from memory
+    robot.action_catalog = ActionCatalog(roslibpy.Topic(ros, "/action_groups_data", "std_msgs/String"))
+    robot.action_executor = ActionExecutor(
+        robot.action,
+        robot.action_catalog.duration,
+        done_topic=roslibpy.Topic(ros, ACTION_DONE_TOPIC, "std_msgs/String") if ACTION_DONE_TOPIC else None,
+        default_duration=ACTION_DEFAULT_DURATION,
+        margin=ACTION_MARGIN,
+    )
+    robot.camera = CameraSubscriber(
+        ros,
+        robot.image_topic,
+        capacity=FRAME_BUFFER_SIZE,
+        transport=IMAGE_TRANSPORT,
+        url=robot.url,
+        clock=FRAME_CLOCK,
+        background_ms=CAMERA_BACKGROUND_MS,
+        idle_timeout=CAMERA_IDLE_TIMEOUT,
+    )
+    robot.qr_scanner = QRScanner(robot.camera, scales=QR_SCALES, adaptive=QR_ADAPTIVE, timeout=QR_TIMEOUT)
+
+    robot.pan_state = None
+    robot.tilt_state = None
+    if HEAD_STATE_TYPE:
+        robot.pan_state = JointMonitor(roslibpy.Topic(ros, '/head_pan_controller/state', HEAD_STATE_TYPE, queue_length=1))
+        robot.tilt_state = JointMonitor(roslibpy.Topic(ros, '/head_tilt_controller/state', HEAD_STATE_TYPE, queue_length=1))
+
+    robot.motion = MotionScheduler(workers=MOTION_WORKERS)
+    robot.motion_library = MotionLibrary(robot.topic_pool, MOTIONS_PATH)
+    robot.walk = WalkStream(
+        robot.joy,
+        robot.motion,
+        lambda: ros.is_connected,
+        rate=WALK_RATE,
+        deadman=WALK_DEADMAN,
+        max_seconds=WALK_MAX_SECONDS,
+    )
+    # Frame k is decoded and encoded for the VLM while the head moves to k+1;
+    # the writer decodes its own copy of the (cached) pixels in the background.
+    robot.sweep_engine = SweepEngine(
+        move=lambda position: sweep_move(robot, position),
+        wait_frame=lambda command_time, position: sweep_frame(robot, command_time, position),
+        encode=sweep_encode,
+        on_frame=lambda frame, position: capture_image(robot, decode=False, frame=frame),
+        workers=SWEEP_WORKERS,
+    )
 
-    defEndmsg = roslibpy.Message({
-        'axes': [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-        'buttons': [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-    })
+    # A failed build stops what it started, so a retry does not subscribe twice
+    robot.camera.start()
+    robot.on_failure(robot.camera.stop)
+    for state in (robot.pan_state, robot.tilt_state):
+        if state is not None:
+            state.start()
+            robot.on_failure(state.stop)
+    robot.action_catalog.start()
+    robot.on_failure(robot.action_catalog.stop)
+    robot.action_executor.start()
+    robot.on_failure(robot.action_executor.stop)
 
-    pan.publish(fmsg[0])    
-    time.sleep(0.65)
-    get_image()
-    pan.publish(fmsg[1])    
-    time.sleep(0.65)
-    get_image()
-    pan.publish(fmsg[2])    
-    time.sleep(0.65)
-    get_image()
-    pan.publish(fmsg[1])
 
+fleet = Fleet(ROBOTS, build_robot, default=DEFAULT_ROBOT, connect_timeout=ROBOT_CONNECT_TIMEOUT)
 
-    getDescriptionPrompt = "You see 3 photos (0,1,2). Return only the number of the photo in which, in your opinion, the object most closely resembles " + targediscr + ". The answer should only be one digit without additional words."
 
-    images = ["image_0.png","image_1.png","image_2.png"]
+def robot_for(robot_id: str = ""):
+    """The robot a tool call is for, connected on first use.
 
-    base64_images = []
-    for img in images:
-        base64_images.append(encode_image("photos/environment/"+img))
+    Returns (robot, None) or (None, error message).
+    """
+    try:
+        return fleet.start(robot_id), None
+    except KeyError:
+        return None, f"Error: unknown robot {robot_id}, use one of {', '.join(fleet.ids())}"
+    except Exception as e:
+        return None, f"Error: robot {robot_id or fleet.default} is not reachable: {e}"
 
-    respons = LLMclient.chat.completions.create(
-    model="Qwen/Qwen2.5-VL-72B-Instruct",
-    messages=[{
-        "role": "user",
-        "content": [
-            {
-                "type": "text",
-                "text": getDescriptionPrompt
-            },
-            {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_images[0]}"
-                }
-            },
-                        {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_images[1]}"
-                }
-            },
-                        {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_images[2]}"
-                }
-            }
-        ]
-    }],
-    )
 
-    pan.publish(fmsg[int(respons.choices[0].message.content)])    
-    time.sleep(0.5)
-       
+def get_image_run(robot, max_side: int = 0, format: str = "", quality: int = 85):
+    #TODO IN sniper game back images on 1 side only. I thn what it error from subscriber
+    if format and format not in ENCODINGS:
+        return "Format error"
+
+    with robot.camera.active():
+        capture, message = capture_image(robot, decode=False)
+    if capture is None:
+        return message
+
+    # Camera JPEGs are passed through; transcode only on request
+    try:
+        data, fmt = frame_bytes(capture["frame"], max_side=max_side, fmt=format or None, quality=quality)
+    except ValueError as e:
+        print(f"[Image] {e}")
+        return "Format error"
+
+    return Image(data=data, format=fmt)
+
+
+@mcp.tool(description="This tool used to get image from robot camera and save on user pc on directory like downloads. " \
+"Optional max_side downscales the image (longest side in pixels), optional format is jpeg, png or webp with quality 1-100. " \
+"Leave them empty to get the camera image as is. " \
+"Optional robot_id picks the robot (empty for the default one, see list_robots).")
+async def get_image(max_side: int = 0, format: str = "", quality: int = 85, robot_id: str = ""):
+    robot, error = await asyncio.to_thread(robot_for, robot_id)
+    if robot is None:
+        return error
+    # Waiting for a frame and transcoding stay off the event loop
+    return await asyncio.to_thread(get_image_run, robot, max_side, format, quality)
+
+
+@mcp.tool(description="This tool lists the most recent captured images of this session with id, time, robot, head pan/tilt and file path.")
+def recent_captures(count: int = 3):
+    return capture_index.last(count)
+
+
+@mcp.tool(description="This tool reports the background image writer state. Set wait to true to block until all captured images are saved to disk.")
+async def image_storage_status(wait: bool = False, timeout: float = 5.0):
+    # Flushing waits for disk writes; keep it off the event loop
+    flushed = await asyncio.to_thread(image_writer.flush, timeout) if wait else None
+    status = image_writer.status()
+    status["captures"] = capture_index.status()
+    if wait:
+        status["flushed"] = flushed
+    return status
+
+
+@mcp.tool(description="This tool reports server counters and stage timings (count, average, last and max in ms), e.g. sniper sweep and VLM times, the robots and each connected robot's shared ROS publisher topics and camera subscription (frames and bytes received, frames used and dropped).")
+def get_metrics():
+    snapshot = metrics.snapshot()
+    snapshot["robots"] = fleet.status()
+    snapshot["topics"] = {robot.id: robot.topic_pool.status() for robot in fleet.robots.values() if robot.ready}
+    snapshot["cameras"] = {robot.id: robot.camera.status() for robot in fleet.robots.values() if robot.ready}
+    return snapshot
+
     
+def sniper_run(robot, targediscr:str, positions: int = 0):
+
+    print("startsnipet tool")
+
+    sweep = even_positions(min(positions, 9)) if positions > 0 else SWEEP_POSITIONS
+    tilt_before = commanded(robot.tilt)
+
+    centermsg = roslibpy.Message({
+        'position': 0,
+        'duration': SWEEP_MOVE_DURATION,
+    })
+
+    # Each frame is encoded for the VLM while the head moves to the next position
+    try:
+        with robot.camera.active():
+            result = robot.sweep_engine.run(sweep)
+    except (TimeoutError, ValueError) as e:
+        print(f"[Sweep] {e}")
+        move_head(robot.pan, centermsg)
+        return "Failed to capture images"
+    move_head(robot.pan, centermsg)
+
+    timings = result["timings"]
+    for wait in timings["frame_wait"]:
+        metrics.observe("sniper.frame_wait", wait)
+    for encode in timings["encode"]:
+        metrics.observe("sniper.encode", encode)
+    metrics.observe("sniper.capture", timings["capture_total"])
+    metrics.observe("sniper.encode_tail", timings["encode_tail"])
+    print(f"[Sweep] {len(sweep)} positions: capture {timings['capture_total']:.2f}s, "
+          f"encode tail {timings['encode_tail'] * 1000:.0f}ms")
+
+    index = None
+    if COLOR_PREFILTER:
+        with metrics.timer("sniper.prefilter"):
+            index, confidence = color_prefilter.select(targediscr, [frame.decode() for frame in result["frames"]])
+        metrics.incr("prefilter.hits" if index is not None else "prefilter.misses")
+        print(f"[Sweep] Color prefilter: photo {index}, confidence {confidence:.2f}")
+
+    # A still scene with the same target reuses the earlier answer of the same robot
+    hashes = [frame_hash for _, frame_hash in result["payloads"]]
+    if index is None:
+        index = target_cache.get(targediscr, sweep, hashes, source=robot.id)
+        if index is not None:
+            metrics.incr("vlm_cache.hits")
+            print(f"[Sweep] Cached target photo {index}")
+    if index is None:
+        metrics.incr("vlm_cache.misses")
+        urls = vision_preprocessor.finish([payload for payload, _ in result["payloads"]])
+        with metrics.timer("sniper.llm"):
+            index = vlm_select(targediscr, urls, len(sweep))
+        if index is None:
+            return "Target not found"
+        target_cache.put(targediscr, sweep, hashes, index, source=robot.id)
+
+    aim = roslibpy.Message({
+        'position': sweep[index][0],
+        'duration': SWEEP_MOVE_DURATION,
+    })
+    command_time = sweep_move(robot, sweep[index])
+    wait_head(robot.pan_state, command_time, aim)
 
-    joy.publish(defStarmsg)
-    time.sleep(1.2)
-    joy.publish(defEndmsg)
-    time.sleep(1)    
-    pan.publish(fmsg[1])
-    time.sleep(0.1) 
 
-    joy.unadvertise()
-    pan.unadvertise()
+
+    # Fire, then re-center the pan and restore the tilt from before the sweep
+    fire = robot.motion_library.timeline("fire_and_center", tilt=tilt_before, duration=SWEEP_MOVE_DURATION)
+    # Already inside the sniper's motion job, so the steps run on its worker
+    fire.play()
+
     return 
 
-@mcp.tool(description="This tool performs SOL transfer by taking a photo, detecting QR code with SOL wallet address, and executing the transfer. Takes amount in SOL as parameter. If user say transfer in $ conver 218,88 $ to 1 SOL. If user just ask about transfer, don't use it tool and just short answer how to use it.")
-def BrewPay(amount: float):
+
+@mcp.tool(description="This tool allows you to play sniper unlike the defender tool here the person says the description of the target and not its position, where it is the robot decides itself" \
+"Tool use one string param, it is description of target to shoot. Optional positions is how many head positions to look from (0 uses the configured sweep, 5-7 for wide rooms). " \
+"Set wait to false to return at once with a motion job id (see motion_status). " \
+"Optional robot_id picks the robot (empty for the default one, see list_robots).")
+async def sniper(targediscr:str, positions: int = 0, wait: bool = True, robot_id: str = ""):
+    robot, error = await asyncio.to_thread(robot_for, robot_id)
+    if robot is None:
+        return error
+    job = robot.motion.run("sniper", ("head", "legs"), sniper_run, robot, targediscr, positions)
+    if not wait:
+        return f"Sniper started as motion job {job.id}"
+    return await job
+
+
+def brewpay_run(robot, amount: float, wait: bool = False):
     """
     Performs SOL transfer:
-    1. Clears photo folder
-    2. Takes a photo
-    3. Searches and recognizes QR code with SOL wallet address
-    4. Validates address
-    5. Executes transfer
+    1. Takes a photo
+    2. Searches and recognizes QR code with SOL wallet address
+    3. Validates address
+    4. Executes transfer
     """
 
     QRSmsg = roslibpy.Message({
@@ -591,64 +951,214 @@ def BrewPay(amount: float):
         'duration': 0.5,
     })
 
-    tilt.publish(QRSmsg)   
-    time.sleep(1.5)
+    # Warm the RPC connection and blockhash while the head moves
+    solana_rpc.prefetch()
 
     try:
-        print(f"Starting transfer of {amount} SOL")
-        
-        # 1. Clear photo folder
-        photo_cln("photos/environment")
-        print("Photo folder cleared")
-        
-        # 2. Take a photo
-        print("Taking photo...")
-        image_result = get_image()
-        print("Ready")
-        
-        image_path = "photos/environment/image_0.png" 
+        # Full camera rate from the head tilt until the QR code is read
+        with robot.camera.active():
+            command_time = move_head(robot.tilt, QRSmsg)
+            print(f"Starting transfer of {amount} SOL")
 
-        tilt.publish(Zermsg)
-        
-        
-        print(f"Analyzing photo: {image_path}")
-        
-        # 4. Recognize QR code
-        qr_data, qr_message = detect_qr_code(image_path)
-        if qr_data is None:
-            return f"Error: {qr_message}"
+            # 1. Take a photo once the head has tilted down
+            print("Taking photo...")
+            capture, capture_message = capture_after_move(robot, robot.tilt_state, command_time, QRSmsg)
+            print("Ready")
+            if capture is None:
+                move_head(robot.tilt, Zermsg)
+                return f"Error: {capture_message}"
+
+            print(f"Analyzing photo: {capture['path']}")
+
+            # 4. Recognize QR code in memory, retrying on fresh frames
+            qr_codes, scan = robot.qr_scanner.scan(first=capture["frame"])
+            metrics.observe("brewpay.qr_scan", scan["elapsed"])
+
+        move_head(robot.tilt, Zermsg)
+
+        if not qr_codes:
+            metrics.incr("qr.misses")
+            print(f"[QR] Not found in {scan['frames']} frames")
+            return "Error: QR code not found on image"
+
+        metrics.incr(f"qr.hits.scale_{scan['scale']}" + ("_threshold" if scan["threshold"] else ""))
+        print(f"[QR] Found in frame {scan['frames']} (seq {scan['seq']}) at scale {scan['scale']}"
+              f"{' after threshold' if scan['threshold'] else ''} in {scan['elapsed'] * 1000:.0f}ms")
+        qr_data = qr_codes[0]
         
         print(f"QR code recognized: {qr_data}")
         
         # 5. Validate SOL address
-        is_valid, validation_message = validate_sol_address(qr_data)
+        with metrics.timer("brewpay.validate"):
+            is_valid, validation_message = validate_sol_address(qr_data)
         if not is_valid:
             return f"Error: {validation_message}"
         
         print(f"SOL address is valid: {qr_data}")
         
         # 6. Load private key
-        private_key, key_message = load_private_key()
+        with metrics.timer("brewpay.key_load"):
+            private_key, key_message = load_private_key()
         if private_key is None:
             return f"Error: {key_message}"
         
         print("Private key loaded")
         
         # 7. Execute transfer
-        success, transfer_message = transfer_sol(qr_data, amount, private_key)
+        success, transfer_message = transfer_sol(qr_data, amount, private_key, wait=wait)
         if not success:
             return f"Transfer error: {transfer_message}"
+        if not wait:
+            return f"Submitted, pending confirmation (see payment_status): {transfer_message}"
         
         return f"Success! {transfer_message}"
         
     except Exception as e:
         return f"Critical error: {str(e)}"
 
+def brewpay_batch_run(robot, amount: float, recipients: int = 0, scan_seconds: float = 10.0, wait: bool = False):
+    QRSmsg = roslibpy.Message({
+        'position': -0.3,
+        'duration': 0.5,
+    })
+    Zermsg = roslibpy.Message({
+        'position': -0.3,
+        'duration': 0.5,
+    })
+
+    solana_rpc.prefetch()
+
+    try:
+        with robot.camera.active():
+            command_time = move_head(robot.tilt, QRSmsg)
+            capture, capture_message = capture_after_move(robot, robot.tilt_state, command_time, QRSmsg)
+            if capture is None:
+                move_head(robot.tilt, Zermsg)
+                return f"Error: {capture_message}"
+
+            # Only valid addresses count towards the recipients limit
+            addresses, scan = robot.qr_scanner.collect(
+                first=capture["frame"],
+                timeout=scan_seconds,
+                accept=lambda data: validate_sol_address(data)[0],
+                limit=max(0, recipients),
+            )
+            metrics.observe("brewpay.qr_collect", scan["elapsed"])
+        move_head(robot.tilt, Zermsg)
+
+        print(f"[QR] {len(addresses)} addresses in {scan['frames']} frames")
+        if not addresses:
+            return "Error: no valid SOL address QR codes found"
+
+        private_key, key_message = load_private_key()
+        if private_key is None:
+            return f"Error: {key_message}"
+
+        success, transfer_message = transfer_sol_batch(addresses, amount, private_key, wait=wait)
+        if not success:
+            return f"Transfer error: {transfer_message}"
+        if not wait:
+            return f"Submitted, pending confirmation (see payment_status): {transfer_message}"
+        return f"Success! {transfer_message}"
+
+    except Exception as e:
+        return f"Critical error: {str(e)}"
+
+
+@mcp.tool(description="This tool performs SOL transfer by taking a photo, detecting QR code with SOL wallet address, and executing the transfer. Takes amount in SOL as parameter. If user say transfer in $ conver 218,88 $ to 1 SOL. If user just ask about transfer, don't use it tool and just short answer how to use it. " \
+"By default it returns once the transfer is sent with a payment job id; set wait to true to wait for network confirmation. " \
+"Optional robot_id picks the robot (empty for the default one, see list_robots).")
+async def BrewPay(amount: float, wait: bool = False, robot_id: str = ""):
+    robot, error = await asyncio.to_thread(robot_for, robot_id)
+    if robot is None:
+        return error
+    # The head tilt and QR scan run as a motion job, off the event loop
+    return await robot.motion.run("BrewPay", ("head",), brewpay_run, robot, amount, wait)
+
+
+@mcp.tool(description="This tool pays the same amount of SOL to several people: it scans QR codes with SOL wallet addresses, several in view at once or shown one after another, " \
+"and sends all transfers packed into as few transactions as possible. Takes amount in SOL per person, optional recipients is how many addresses to wait for (0 = everyone scanned within scan_seconds). " \
+"By default it returns once the transfers are sent with payment job ids; set wait to true to wait for network confirmation. " \
+"Optional robot_id picks the robot (empty for the default one, see list_robots).")
+async def BrewPayBatch(amount: float, recipients: int = 0, scan_seconds: float = 10.0, wait: bool = False, robot_id: str = ""):
+    robot, error = await asyncio.to_thread(robot_for, robot_id)
+    if robot is None:
+        return error
+    return await robot.motion.run("BrewPayBatch", ("head",), brewpay_batch_run, robot, amount, recipients, scan_seconds, wait)
+
+
+@mcp.tool(description="This tool reports the state of BrewPay payment jobs (pending, confirmed, failed or expired). Pass the job id, or 0 to list recent payments.")
+def payment_status(job_id: int = 0):
+    if job_id:
+        job = payment_confirmer.get(job_id)
+        if job is None:
+            return f"Error: unknown payment job {job_id}"
+        return job.status()
+    return [job.status() for job in payment_confirmer.jobs()]
+
+
+@mcp.tool(description="This tool reports motion jobs (defend, sniper, BrewPay, make_step): queued, running, done or failed. " \
+"Pass the job id, or 0 to list recent motions; wait is how many seconds to wait for the job to finish. " \
+"Optional robot_id picks the robot (empty for the default one, see list_robots).")
+async def motion_status(job_id: int = 0, wait: float = 0.0, robot_id: str = ""):
+    robot, error = await asyncio.to_thread(robot_for, robot_id)
+    if robot is None:
+        return error
+    if job_id:
+        job = robot.motion.get(job_id)
+        if job is None:
+            return f"Error: unknown motion job {job_id}"
+        if wait > 0 and not job.done:
+            await asyncio.wait([asyncio.wrap_future(job.future)], timeout=wait)
+        status = job.status()
+        if job.done and job.error is None and job.future.result() is not None:
+            status["result"] = job.future.result()
+        return status
+    return [job.status() for job in robot.motion.jobs()]
+
+
+@mcp.tool(description="This tool lists the robots this server drives with their rosbridge address, whether they are connected, and which one is the default.")
+def list_robots():
+    return fleet.status()
+
+
+# Tools broadcast can run on several robots; payments and images are left out
+BROADCAST_TOOLS = {
+    "make_step": make_step,
+    "defend": defend,
+    "sniper": sniper,
+    "run_action": run_action,
+    "get_available_actions": get_available_actions,
+    "action_status": action_status,
+    "motion_status": motion_status,
+}
+
+
+@mcp.tool(description="This tool runs another tool on several robots at the same time and returns each robot's result by robot id. " \
+f"tool is one of {', '.join(BROADCAST_TOOLS)}; arguments are that tool's parameters without robot_id; " \
+"robot_ids is a comma-separated list of robots (empty for all of them).")
+async def broadcast(tool: str, arguments: Optional[dict] = None, robot_ids: str = ""):
+    fn = BROADCAST_TOOLS.get(tool)
+    if fn is None:
+        return f"Error: {tool} cannot be broadcast, use one of {', '.join(BROADCAST_TOOLS)}"
+    try:
+        robot_ids = fleet.select(robot_ids)
+    except KeyError as e:
+        return f"Error: unknown robot {e.args[0]}, use one of {', '.join(fleet.ids())}"
+    arguments = {key: value for key, value in (arguments or {}).items() if key != "robot_id"}
+
+    async def call(robot_id):
+        if asyncio.iscoroutinefunction(fn):
+            return await fn(**arguments, robot_id=robot_id)
+        return await asyncio.to_thread(fn, **arguments, robot_id=robot_id)
+
+    with metrics.timer(f"broadcast.{tool}"):
+        return await fleet.broadcast(robot_ids, call)
+
 if __name__ == "__main__":
     # Ensure all necessary directories exist
     ensure_directories()
-    
-    ROSclient.run()
-    time.sleep(0.5)
-    Csubscriber.subs()
+
+    # The default robot connects now, the others on first use
+    fleet.start()
     mcp.run(transport="streamable-http")
@@ -20,6 +20,9 @@ import io
 
 from pvrecorder import PvRecorder
 
+from brewie.primitives import MotionLibrary
+from brewie.topics import TopicPool
+
 
 def ensure_directories():
     """Creates necessary directories if they don't exist"""
@@ -73,6 +76,9 @@ KEYWORD_PATHS = [
 WAKE_WORD = "nex"
 #MODEL_NAME = "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"
 MODEL_NAME = "meta-llama/Llama-3.3-70B-Instruct-Turbo"
+# Tools that only run when the speaker is verified as the master; broadcast
+# can run sniper and defend on every robot
+PRIVILEGED_TOOLS = {"sniper", "defend", "BrewPay", "BrewPayBatch", "broadcast"}
 # ==============================
 # TTS function
 # ==============================
@@ -302,7 +308,7 @@ async def handle_conversation(user_input: str):
             actrig = False
             for command in commands:
                 tool_name = command.get("tool")
-                if (tool_name == "sniper" or tool_name =="defend" or tool_name == "BrewPay"):
+                if tool_name in PRIVILEGED_TOOLS:
                     actrig = True
                     toolis = True
                 
@@ -360,7 +366,7 @@ async def handle_conversation(user_input: str):
                 params = command.get("params", {})
 
                 tool_name = command.get("tool")
-                if ((tool_name == "sniper" or tool_name =="defend" or tool_name == "BrewPay") and master_talk) or (tool_name != "sniper" and tool_name !=  "defend" and tool_name != "BrewPay"):
+                if tool_name not in PRIVILEGED_TOOLS or master_talk:
                     permissions = True
                     
                 print(permissions)
@@ -425,24 +431,13 @@ async def main():
     client.run()
     time.sleep(1)
 
-    pan = roslibpy.Topic(client, '/head_pan_controller/command', 'std_msgs/Float64')
-    tilt = roslibpy.Topic(client, '/head_tilt_controller/command', 'std_msgs/Float64')
-    action = roslibpy.Topic(client, '/app/set_action', 'std_msgs/String')
-
-    headUPmsg = roslibpy.Message({
-        'position': 0.2,
-        'duration': 0.5,
-    })
-
-    headDOWNmsg = roslibpy.Message(    {
-        'position': 0.0,
-        'duration': 0.5,
-    })
-
-    panFXmsg = roslibpy.Message(    {
-        'position': 0.0,
-        'duration': 0.5,
-    })
+    topic_pool = TopicPool(client)
+    action = topic_pool.get('/app/set_action', 'std_msgs/String')
+    # Head moves (look_up, look_down, center, scout) are declared in motions.json
+    motions = MotionLibrary(
+        topic_pool,
+        os.getenv("BREWIE_MOTIONS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "motions.json")),
+    )
 
     standBmsg = roslibpy.Message(    {
         'data': 'walk_ready'
@@ -452,14 +447,6 @@ async def main():
         'data': 'think'
     })
 
-    s1msg = roslibpy.Message({
-        'position': 1,
-        'duration': 0.25,
-    })
-    s2msg = roslibpy.Message({
-        'position': -1.2,
-        'duration': 4.5,
-    })
     s3sg = roslibpy.Message({
         'position': 0,
         'duration': 0.5,
@@ -469,12 +456,12 @@ async def main():
     recognizer = sr.Recognizer()
     mic = sr.Microphone(sample_rate=16000)
 
-    pan.publish(panFXmsg)
+    motions.timeline("center_pan").play()
 
 
     filelist=get_files_in_directory("master_sh")
 
-    tilt.publish(headUPmsg)
+    motions.timeline("look_up").play()
     
     if "master_voice" not in filelist:     
         speak_with_gtts("Welcome new master ")
@@ -491,7 +478,7 @@ async def main():
     
     speak_with_gtts("I am ready")
     time.sleep(1)
-    tilt.publish(headDOWNmsg)
+    motions.timeline("look_down").play()
 
 
 
@@ -541,29 +528,25 @@ async def main():
 
             if keyword_index >= 0:
                 print("Wake word detected!")
-                tilt.publish(headUPmsg)
+                motions.timeline("look_up").play()
                 #speak_with_gtts("Yes?")
                 print("Listening for command...")
                 user_query = recognize_speech_from_mic(recognizer, mic)
                 if user_query:       
                     
-                    tilt.publish(headDOWNmsg)
+                    motions.timeline("look_down").play()
                     if any(word in user_query for word in search_words):
                         speak_with_gtts("I'll scout out the situation....")
-                        pan.publish(s1msg)
-                        time.sleep(0.5)
-                        pan.publish(s2msg)
+                        motions.timeline("scout").play()
                     #else:
                         #action.publish(thinkmsg)
                         #speak_with_gtts("Thinking...")
                     await handle_conversation(user_query)
-                    pan.publish(panFXmsg)
-                    tilt.publish(panFXmsg)
+                    motions.timeline("center").play()
 
                 else:
                     speak_with_gtts("I didn't catch that")
-                    tilt.publish(headDOWNmsg)
-                    pan.publish(panFXmsg)
+                    motions.timeline("center").play()
 
                     
     except KeyboardInterrupt:
@@ -572,9 +555,7 @@ async def main():
     finally:
         # Clean up resources
         print("\n Cleaning...")
-        action.unadvertise()
-        tilt.unadvertise()
-        pan.unadvertise()
+        topic_pool.close()
         client.terminate()
         stop_tts()
         if 'porcupine' in locals():